@@ -0,0 +1,44 @@
+from interpreter import Interpreter
+from closure_compiler import ClosureInterpreter, LexicalClosureInterpreter
+from resolver import LexicalInterpreter
+from vm import VM
+from transpiler import PythonInterpreter
+from quicken import QuickeningInterpreter
+from errors import BaklolError
+
+# Execution backends selectable from kanp.py and server.py.
+# Every backend is Interpreter-compatible: construct it, then either call
+# visit(ast) or run_prepared(prepare(ast)).
+# Backends with a run_source(code) method cache their own compiled form and
+# are handed the raw source instead, so cache hits skip lexing and parsing.
+BACKENDS = {
+    "tree": Interpreter,
+    "specializing": QuickeningInterpreter,
+    "closure": ClosureInterpreter,
+    "vm": VM,
+    "python": PythonInterpreter,
+}
+
+# Opt-in proper lexical scoping with array-backed frames (see resolver.py).
+# Only run these through prepare()/run_prepared().
+LEXICAL_BACKENDS = {
+    "tree": LexicalInterpreter,
+    "closure": LexicalClosureInterpreter,
+}
+
+DEFAULT_BACKEND = "tree"
+SCOPINGS = ("dynamic", "lexical")
+DEFAULT_SCOPING = "dynamic"
+
+def get_backend(name=None, scoping=None):
+    name = name or DEFAULT_BACKEND
+    scoping = scoping or DEFAULT_SCOPING
+    if name not in BACKENDS:
+        raise BaklolError(f"Backend '{name}' naam ka kuch nahi hota. Ye try karo: {', '.join(BACKENDS)}", 0)
+    if scoping not in SCOPINGS:
+        raise BaklolError(f"Scoping '{scoping}' kya hota hai? '{SCOPINGS[0]}' ya '{SCOPINGS[1]}' bolo.", 0)
+    if scoping == "lexical":
+        if name not in LEXICAL_BACKENDS:
+            raise BaklolError(f"Lexical scoping abhi sirf {', '.join(LEXICAL_BACKENDS)} backend me hai.", 0)
+        return LEXICAL_BACKENDS[name]
+    return BACKENDS[name]
@@ -0,0 +1,69 @@
+"""Benchmark re-parsing an edited program: whole vs IncrementalParser.
+
+Usage: python benchmarks/incremental_bench.py [--lines 100,1000,10000] [--edits 20]
+
+Each size is a program of suite_bench's LARGE_CHUNK declarations. It is
+parsed once to fill the fragment cache, then --edits times one statement
+somewhere in it is changed, as a playground user would between two runs,
+and the edited source is parsed both ways: FastLexer + Parser over the
+whole source, and IncrementalParser.parse(). Shows the mean time per
+parse and checks that both give the same tree (compared packed).
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import FastLexer
+from parser import Parser
+from compact_ast import pack
+from incremental import IncrementalParser
+from suite_bench import LARGE_CHUNK
+
+def packed(tree):
+    program = pack(tree)
+    return (bytes(program.kinds), program.a.tobytes(), program.b.tobytes(), program.c.tobytes(),
+            program.lines.tobytes(), repr(program.consts), program.names,
+            program.block_items.tobytes(), program.block_ends.tobytes())
+
+def edited(chunks, edit):
+    """Source with one chunk's function changed, a different one for every edit."""
+    chunks = list(chunks)
+    k = (edit * 7919) % len(chunks)
+    chunks[k] = chunks[k].replace("bhej a - 1", f"bhej a - {edit + 2}")
+    return "".join(chunks)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--lines", default="100,1000,10000", help="comma-separated program sizes")
+    arg_parser.add_argument("--edits", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    lines_per_chunk = LARGE_CHUNK.count("\n")
+    print(f"One edited statement per parse, mean of {args.edits} edits")
+    print(f"  {'lines':>7} {'whole':>10} {'incremental':>12} {'speedup':>8}")
+    same = True
+    for lines in (int(lines) for lines in args.lines.split(",")):
+        chunks = [LARGE_CHUNK.format(i=i) for i in range(max(1, lines // lines_per_chunk))]
+        incremental = IncrementalParser()
+        incremental.parse("".join(chunks))
+        whole_seconds = incremental_seconds = 0
+        for edit in range(args.edits):
+            source = edited(chunks, edit)
+            start = time.perf_counter()
+            whole = Parser(FastLexer(source).tokenize()).parse()
+            whole_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            tree = incremental.parse(source)
+            incremental_seconds += time.perf_counter() - start
+            same = same and packed(whole) == packed(tree)
+        print(f"  {len(chunks) * lines_per_chunk:>7,} {whole_seconds / args.edits * 1000:>8.2f}ms "
+              f"{incremental_seconds / args.edits * 1000:>10.2f}ms {whole_seconds / incremental_seconds:>7.1f}x")
+    print(f"Trees identical: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark getting a script's tree: lexing and parsing it vs loading its .kanpc.
+
+Usage: python benchmarks/kanpc_bench.py [--sizes 10,100,1000] [--repeat 5]
+
+Each size (in KB) is a suite_bench 'large' program written to a temporary
+directory. It is timed three ways, best of --repeat: FastLexer + Parser,
+kanpc.load() writing a fresh .kanpc (a first run), and kanpc.load() reading
+the .kanpc back (every later run). Also shows the .kanpc size and checks
+that the loaded tree is the parsed one.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kanpc
+from compact_ast import pack
+from suite_bench import generate_large
+
+def best(function, repeat):
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds, result
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", default="10,100,1000", help="comma-separated program sizes in KB")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"Best of {args.repeat}")
+    print(f"  {'source':>9} {'.kanpc':>9} {'parse':>10} {'first run':>10} {'cached':>10} {'speedup':>8}")
+    same = True
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(size) for size in args.sizes.split(",")):
+            source = generate_large(size * 1024)
+            path = os.path.join(directory, f"large_{size}.kanp")
+            with open(path, "w") as f:
+                f.write(source)
+
+            def first_run():
+                if os.path.exists(kanpc.cache_path(path)):
+                    os.unlink(kanpc.cache_path(path))
+                return kanpc.load(path, source)
+
+            parse_seconds, parsed = best(lambda: kanpc.parse(source), args.repeat)
+            write_seconds, _ = best(first_run, args.repeat)
+            load_seconds, loaded = best(lambda: kanpc.load(path, source), args.repeat)
+            same = same and pack(parsed).__dict__ == pack(loaded).__dict__
+            print(f"  {len(source):>9,} {os.path.getsize(kanpc.cache_path(path)):>9,} "
+                  f"{parse_seconds * 1000:>8.1f}ms {write_seconds * 1000:>8.1f}ms "
+                  f"{load_seconds * 1000:>8.1f}ms {parse_seconds / load_seconds:>7.1f}x")
+    print(f"Trees identical: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
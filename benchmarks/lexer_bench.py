@@ -0,0 +1,74 @@
+"""Benchmark FastLexer against the character-at-a-time Lexer.
+
+Usage: python benchmarks/lexer_bench.py [--size-mb 4] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer, FastLexer
+
+CHUNK = '''hum_rakhte_hain counter_{i} = {i}
+jabtak counter_{i} > 0 {{
+    counter_{i} = counter_{i} - 1
+    agar counter_{i} == 3 {{ bol "teen bacha hai" }} warna {{ bol counter_{i} * 2.5 }}
+}}
+kaam jod_{i}(a, b) {{
+    bhej a + b
+}}
+bol jod_{i}({i}, 42) >= 10
+'''
+
+def generate_source(size_bytes):
+    parts = []
+    total = 0
+    i = 0
+    while total < size_bytes:
+        chunk = CHUNK.format(i=i)
+        parts.append(chunk)
+        total += len(chunk)
+        i += 1
+    return "".join(parts)
+
+def best_time(lexer_class, source, repeat):
+    best = None
+    tokens = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = lexer_class(source).tokenize()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--size-mb", type=float, default=4)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source = generate_source(int(args.size_mb * 1024 * 1024))
+    size_mb = len(source) / (1024 * 1024)
+    print(f"Source: {size_mb:.2f} MB, {source.count(chr(10))} lines")
+
+    results = {}
+    for lexer_class in (Lexer, FastLexer):
+        elapsed, tokens = best_time(lexer_class, source, args.repeat)
+        results[lexer_class.__name__] = (elapsed, tokens)
+        print(f"{lexer_class.__name__:<10} {elapsed:8.3f}s  {size_mb / elapsed:7.2f} MB/s  "
+              f"{len(tokens) / elapsed:12,.0f} tokens/s")
+
+    slow_tokens = results["Lexer"][1]
+    fast_tokens = results["FastLexer"][1]
+    same = len(slow_tokens) == len(fast_tokens) and all(
+        (a.type, a.value, a.line) == (b.type, b.value, b.line)
+        for a, b in zip(slow_tokens, fast_tokens)
+    )
+    print(f"Speedup: {results['Lexer'][0] / results['FastLexer'][0]:.1f}x, token streams identical: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Measure how much memory tokens and ASTs keep alive, per token / per node.
+
+Usage: python benchmarks/memory_bench.py [--size-mb 2]
+"""
+import os
+import gc
+import sys
+import argparse
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import FastLexer, generate_tokens
+from parser import Parser
+from optimizer import count_nodes
+from compact_ast import pack
+from lexer_bench import generate_source
+
+def retained(build):
+    """Runs build() under tracemalloc, returns (result, bytes still allocated)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def parse_and_pack(source):
+    # The tree is dropped, so only what the packed form keeps is counted
+    return pack(Parser(generate_tokens((source,))).parse())
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--size-mb", type=float, default=2)
+    args = arg_parser.parse_args()
+
+    source = generate_source(int(args.size_mb * 1024 * 1024))
+    print(f"Source: {len(source) / (1024 * 1024):.2f} MB, {source.count(chr(10))} lines")
+
+    tokens, token_bytes = retained(lambda: FastLexer(source).tokenize())
+    print(f"Tokens       {len(tokens):>10,}  {token_bytes / (1024 * 1024):8.2f} MB  {token_bytes / len(tokens):6.1f} bytes/token")
+    del tokens
+
+    tree, tree_bytes = retained(lambda: Parser(generate_tokens((source,))).parse())
+    nodes = count_nodes(tree)
+    print(f"AST objects  {nodes:>10,}  {tree_bytes / (1024 * 1024):8.2f} MB  {tree_bytes / nodes:6.1f} bytes/node")
+    del tree
+
+    packed, packed_bytes = retained(lambda: parse_and_pack(source))
+    print(f"Packed AST   {len(packed):>10,}  {packed_bytes / (1024 * 1024):8.2f} MB  {packed_bytes / len(packed):6.1f} bytes/node")
+    print(f"Packed / objects: {packed_bytes / tree_bytes:.2f}x")
+
+if __name__ == "__main__":
+    main()
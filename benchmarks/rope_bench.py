@@ -0,0 +1,85 @@
+"""Benchmark building long strings with '+', with and without ropes.
+
+Usage: python benchmarks/rope_bench.py [--backend tree] [--sizes 100000,1000000]
+           [--piece 100] [--repeat 3]
+
+Each size runs a program whose jabtak loop appends a --piece character
+literal to a variable until it is that many characters long, then compares
+and prints it (both flatten the rope). The plain run sets rope.ROPE_MIN so
+high that '+' never builds a Rope, which is how strings were joined before:
+every append copies the whole string, so it grows quadratically. Outputs of
+the two runs must be identical.
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rope
+from lexer import FastLexer
+from parser import Parser
+from backends import BACKENDS, DEFAULT_BACKEND, get_backend
+
+PROGRAM = '''hum_rakhte_hain s = ""
+hum_rakhte_hain i = 0
+jabtak i < {count} {{
+    s = s + "{piece}"
+    i = i + 1
+}}
+hum_rakhte_hain t = s + ""
+bol s == t
+bol s
+'''
+
+def run(source, backend_class, rope_min):
+    """(seconds, output) of one run with rope.ROPE_MIN set to rope_min."""
+    saved = rope.ROPE_MIN
+    rope.ROPE_MIN = rope_min
+    try:
+        tree = Parser(FastLexer(source).tokenize()).parse()
+        output = io.StringIO()
+        interpreter = backend_class(output=output)
+        program = interpreter.prepare(tree)
+        start = time.perf_counter()
+        interpreter.run_prepared(program)
+        return time.perf_counter() - start, output.getvalue()
+    finally:
+        rope.ROPE_MIN = saved
+
+def best_run(source, backend_class, rope_min, repeat):
+    best = None
+    output = None
+    for _ in range(repeat):
+        elapsed, output = run(source, backend_class, rope_min)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    arg_parser.add_argument("--sizes", default="100000,1000000", help="comma-separated final string lengths")
+    arg_parser.add_argument("--piece", type=int, default=100, help="characters appended per iteration")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    backend_class = get_backend(args.backend)
+    piece = ("abcdefghij" * (args.piece // 10 + 1))[:args.piece]
+    print(f"Backend {args.backend}, {args.piece}-character pieces, best of {args.repeat}, ROPE_MIN {rope.ROPE_MIN}")
+    print(f"  {'length':>9} {'appends':>8} {'plain':>10} {'rope':>10} {'speedup':>8}")
+    same = True
+    for size in (int(size) for size in args.sizes.split(",")):
+        count = max(1, size // args.piece)
+        source = PROGRAM.format(count=count, piece=piece)
+        plain, plain_output = best_run(source, backend_class, sys.maxsize, args.repeat)
+        roped, rope_output = best_run(source, backend_class, rope.ROPE_MIN, args.repeat)
+        same = same and plain_output == rope_output
+        print(f"  {count * args.piece:>9,} {count:>8,} {plain:>9.4f}s {roped:>9.4f}s {plain / roped:>7.1f}x")
+    print(f"Outputs identical: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
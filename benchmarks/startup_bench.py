@@ -0,0 +1,109 @@
+"""Benchmark running many tiny scripts: a new kanp.py process each time vs the warm daemon.
+
+Usage: python benchmarks/startup_bench.py [--scripts 50] [--backend tree]
+
+Runs each of --scripts small generated programs, one command per script
+as a CI job would, three ways: 'python kanp.py', 'python kanp_client.py'
+with no daemon listening (it falls back to running in-process), and
+'python kanp_client.py' with a daemon started on a private socket. Shows
+the wall-clock time per script and checks that all three print the same.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KANP = os.path.join(ROOT, "kanp.py")
+CLIENT = os.path.join(ROOT, "kanp_client.py")
+DAEMON = os.path.join(ROOT, "daemon.py")
+
+SCRIPT = '''hum_rakhte_hain n = {i}
+kaam dugna(x) {{
+    bhej x * 2
+}}
+jabtak n > 0 {{
+    n = n - 1
+}}
+bol "script {i}: " + "chaukas"
+bol dugna({i})
+'''
+
+def write_scripts(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"script_{i}.kanp")
+        with open(path, "w") as f:
+            f.write(SCRIPT.format(i=i))
+        paths.append(path)
+    return paths
+
+def time_runs(command, scripts, env):
+    """(seconds per script, outputs)"""
+    seconds = []
+    outputs = []
+    for script in scripts:
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *command, script], env=env, capture_output=True, text=True)
+        seconds.append(time.perf_counter() - start)
+        outputs.append((result.returncode, result.stdout, result.stderr))
+    return seconds, outputs
+
+def wait_for_socket(path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            time.sleep(0.05)
+        finally:
+            sock.close()
+    return False
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scripts", type=int, default=50)
+    arg_parser.add_argument("--backend", default="tree")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        scripts = write_scripts(directory, args.scripts)
+        env = dict(os.environ, KANP_DAEMON_SOCKET=os.path.join(directory, "daemon.sock"))
+        options = ["--backend", args.backend]
+
+        results = {}
+        results["kanp.py"] = time_runs([KANP, *options], scripts, env)
+        results["client, no daemon"] = time_runs([CLIENT, *options], scripts, env)
+
+        start = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, DAEMON], env=env, stdout=subprocess.DEVNULL)
+        try:
+            if not wait_for_socket(env["KANP_DAEMON_SOCKET"]):
+                print("❌ Error: Daemon start nahi hua")
+                return 1
+            daemon_start = time.perf_counter() - start
+            results["client + daemon"] = time_runs([CLIENT, *options], scripts, env)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print(f"{args.scripts} scripts, backend {args.backend}, one process per script "
+          f"(daemon took {daemon_start * 1000:.0f} ms to start)")
+    print(f"  {'path':<20} {'mean':>9} {'median':>9} {'total':>9}")
+    base = statistics.mean(results["kanp.py"][0])
+    for name, (seconds, outputs) in results.items():
+        mean = statistics.mean(seconds)
+        print(f"  {name:<20} {mean * 1000:>7.1f}ms {statistics.median(seconds) * 1000:>7.1f}ms "
+              f"{sum(seconds):>8.2f}s  {base / mean:.1f}x")
+    same = all(outputs == results["kanp.py"][1] for _, outputs in results.values())
+    print(f"Outputs identical: {same}")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
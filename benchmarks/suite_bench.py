@@ -0,0 +1,258 @@
+"""Time the lexer, parser and interpreter phases over a set of workloads.
+
+Usage: python benchmarks/suite_bench.py [--backend tree] [--scoping dynamic]
+           [--repeat 3] [--size-mb 1] [--only loop,strings] [--no-memory]
+           [--json results.json] [--baseline benchmarks/baseline.json]
+           [--save-baseline] [--threshold 0.15]
+
+Workloads are the .kanp files in benchmarks/workloads plus one generated
+large file. Each is lexed (FastLexer.tokenize), parsed (Parser.parse),
+prepared (backend.prepare) and run (backend.run_prepared) separately; a
+phase's time is the best of --repeat runs. ops/sec counts tokens for lex,
+AST nodes for parse and prepare, and budget steps (loop iterations plus
+kaam calls) for run. Peak memory is measured in a separate pass under
+tracemalloc, so it does not slow the timed runs.
+
+With a baseline file, every phase is compared against it and a time or
+peak memory more than --threshold above the baseline is flagged as a
+regression (exit status 1). --save-baseline stores this run as the
+baseline instead. Baselines are only comparable on the same machine.
+"""
+import io
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+from lexer import FastLexer
+from parser import Parser
+from optimizer import count_nodes
+from backends import BACKENDS, DEFAULT_BACKEND, SCOPINGS, DEFAULT_SCOPING, get_backend
+
+WORKLOAD_DIR = os.path.join(BENCH_DIR, "workloads")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+# Bump when the JSON layout changes
+RESULTS_VERSION = 1
+PHASES = ("lex", "parse", "prepare", "run")
+OPS_UNITS = {"lex": "tokens", "parse": "nodes", "prepare": "nodes", "run": "steps"}
+# A budget so large it never runs out, only there to count steps
+COUNTING_STEPS = 2 ** 62
+# Phases faster than this are timer noise: shown against the baseline, never flagged
+MIN_COMPARED_SECONDS = 0.005
+
+LARGE_CHUNK = '''hum_rakhte_hain v_{i} = {i}
+kaam badlo_{i}(a) {{
+    agar a > 2 {{
+        bhej a - 1
+    }} warna {{
+        bhej a + 1
+    }}
+}}
+v_{i} = badlo_{i}(v_{i}) * 2
+agar v_{i} == 3 {{ bol "teen" }}
+'''
+
+def generate_large(size_bytes):
+    """Many top-level declarations: lexing and parsing cost grow, the run stays short."""
+    parts = []
+    total = 0
+    i = 0
+    while total < size_bytes:
+        chunk = LARGE_CHUNK.format(i=i)
+        parts.append(chunk)
+        total += len(chunk)
+        i += 1
+    return "".join(parts)
+
+def load_workloads(size_mb, only=None):
+    workloads = {}
+    for name in sorted(os.listdir(WORKLOAD_DIR)):
+        if name.endswith(".kanp"):
+            with open(os.path.join(WORKLOAD_DIR, name)) as f:
+                workloads[name[:-len(".kanp")]] = f.read()
+    workloads["large"] = generate_large(int(size_mb * 1024 * 1024))
+    if only:
+        workloads = {name: source for name, source in workloads.items() if name in only}
+    return workloads
+
+def count_steps(source, scoping):
+    """Budget steps the program takes; the same on every backend."""
+    interpreter = get_backend("tree", scoping)(output=io.StringIO(), max_steps=COUNTING_STEPS)
+    interpreter.run_prepared(interpreter.prepare(Parser(FastLexer(source).tokenize()).parse()))
+    return interpreter.budget.chunk - interpreter.ticks
+
+def run_phases(source, backend_class):
+    """One lex, parse, prepare and run of source: (seconds per phase, tokens, tree)."""
+    times = {}
+    start = time.perf_counter()
+    tokens = FastLexer(source).tokenize()
+    times["lex"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tree = Parser(tokens).parse()
+    times["parse"] = time.perf_counter() - start
+
+    interpreter = backend_class(output=io.StringIO())
+    start = time.perf_counter()
+    program = interpreter.prepare(tree)
+    times["prepare"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreter.run_prepared(program)
+    times["run"] = time.perf_counter() - start
+    return times, tokens, tree
+
+def traced(step):
+    """(step(), peak bytes allocated while it ran)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = step()
+        return value, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def peak_memory(source, backend_class):
+    """Peak bytes allocated by each phase, its inputs not counted."""
+    tokens, lex = traced(lambda: FastLexer(source).tokenize())
+    tree, parse = traced(lambda: Parser(tokens).parse())
+    interpreter = backend_class(output=io.StringIO())
+    program, prepare = traced(lambda: interpreter.prepare(tree))
+    _, run = traced(lambda: interpreter.run_prepared(program))
+    return {"lex": lex, "parse": parse, "prepare": prepare, "run": run}
+
+def bench_workload(source, backend_class, scoping, repeat, memory):
+    best = {}
+    tokens = tree = None
+    for _ in range(repeat):
+        times, tokens, tree = run_phases(source, backend_class)
+        for phase, seconds in times.items():
+            best[phase] = min(seconds, best.get(phase, seconds))
+    nodes = count_nodes(tree)
+    ops = {"lex": len(tokens), "parse": nodes, "prepare": nodes, "run": count_steps(source, scoping)}
+    peaks = peak_memory(source, backend_class) if memory else {}
+    result = {}
+    for phase in PHASES:
+        result[phase] = {
+            "seconds": best[phase],
+            "ops": ops[phase],
+            "ops_per_sec": ops[phase] / best[phase] if best[phase] > 0 else 0.0,
+            "peak_bytes": peaks.get(phase),
+        }
+    return result
+
+def compare(results, baseline, threshold):
+    """Lines describing every phase against the baseline, and the regressions among them."""
+    lines = []
+    regressions = []
+    for name, phases in results["workloads"].items():
+        base_phases = baseline["workloads"].get(name)
+        if base_phases is None:
+            lines.append(f"  {name:<10} (not in baseline)")
+            continue
+        for phase, result in phases.items():
+            base = base_phases.get(phase)
+            if base is None:
+                continue
+            time_change = result["seconds"] / base["seconds"] - 1 if base["seconds"] else 0.0
+            flags = []
+            if max(result["seconds"], base["seconds"]) < MIN_COMPARED_SECONDS:
+                time_change = 0.0
+            if time_change > threshold:
+                flags.append("SLOWER")
+            if result["peak_bytes"] and base.get("peak_bytes") and result["peak_bytes"] > base["peak_bytes"] * (1 + threshold):
+                flags.append("MORE MEMORY")
+            if time_change < -threshold:
+                flags.append("faster")
+            line = f"  {name:<10} {phase:<8} {base['seconds']:>9.4f}s -> {result['seconds']:>9.4f}s {time_change:>+7.1%}"
+            if result["peak_bytes"] and base.get("peak_bytes"):
+                line += f"  mem {result['peak_bytes'] / base['peak_bytes'] - 1:>+7.1%}"
+            lines.append(f"{line}  {' '.join(flags)}".rstrip())
+            if "SLOWER" in flags or "MORE MEMORY" in flags:
+                regressions.append(f"{name}/{phase}: {', '.join(flag for flag in flags if flag != 'faster')}")
+    return lines, regressions
+
+def format_bytes(size):
+    if size is None:
+        return "-"
+    return f"{size / (1024 * 1024):.2f} MB"
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    arg_parser.add_argument("--scoping", choices=SCOPINGS, default=DEFAULT_SCOPING)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--size-mb", type=float, default=1, help="size of the generated 'large' workload")
+    arg_parser.add_argument("--only", default=None, help="comma-separated workload names")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    arg_parser.add_argument("--json", metavar="FILE", default=None, help="write the results here")
+    arg_parser.add_argument("--baseline", metavar="FILE", default=DEFAULT_BASELINE)
+    arg_parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    arg_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="slowdown or memory growth flagged as a regression (default: %(default)s)")
+    args = arg_parser.parse_args()
+
+    backend_class = get_backend(args.backend, args.scoping)
+    only = set(args.only.split(",")) if args.only else None
+    workloads = load_workloads(args.size_mb, only)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "backend": args.backend,
+        "scoping": args.scoping,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workloads": {},
+    }
+    print(f"Backend {args.backend} ({args.scoping}), best of {args.repeat}")
+    print(f"  {'workload':<10} {'phase':<8} {'time':>10} {'ops/sec':>14} {'unit':<7} {'peak mem':>10}")
+    for name, source in workloads.items():
+        result = bench_workload(source, backend_class, args.scoping, args.repeat, not args.no_memory)
+        results["workloads"][name] = result
+        for phase in PHASES:
+            phase_result = result[phase]
+            print(f"  {name:<10} {phase:<8} {phase_result['seconds']:>9.4f}s {phase_result['ops_per_sec']:>14,.0f} "
+                  f"{OPS_UNITS[phase]:<7} {format_bytes(phase_result['peak_bytes']):>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("backend"), baseline.get("scoping")) != (args.backend, args.scoping):
+        print(f"Baseline is for {baseline.get('backend')} ({baseline.get('scoping')}), not comparing")
+        return 0
+
+    lines, regressions = compare(results, baseline, args.threshold)
+    print(f"\nAgainst baseline from {baseline.get('created', '?')} (threshold {args.threshold:.0%}):")
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import marshal
+from array import array
+from parser import *
+from closure_compiler import op_name
+
+# --- Opcodes ---
+# Every instruction is two ints in the flat stream: opcode, argument.
+# Ordered roughly by how hot they are; vm.py dispatches in the same order.
+LOAD_NAME = 0          # push global_env[names[arg]]
+LOAD_CONST = 1         # push consts[arg]
+BINARY_OP = 2          # pop right, pop left, push BINARY_OPS[arg](left, right)
+STORE_NAME = 3         # global_env[names[arg]] = pop
+CHECK_NAME = 4         # raise if names[arg] was never declared (before VarAssign evaluates)
+POP_JUMP_IF_FALSE = 5  # pop, jump to arg if falsy
+JUMP = 6               # jump to arg
+BEGIN_CALL = 7         # look up call site consts[arg] = (name, argc), check arity
+BIND_ARG = 8           # pop, bind to param #arg of the pending call
+CALL = 9               # enter the pending call
+RETURN = 10            # pop, leave the current function with that value
+RETURN_NONE = 11       # leave the current function with None
+POP_TOP = 12           # discard top of stack
+PRINT = 13             # pop and print
+DEFINE_FUNC = 14       # functions[...] = consts[arg]
+SETUP_BHAUKAAL = 15    # enter a bhaukaal block
+END_BHAUKAAL = 16      # leave a bhaukaal block
+THROW = 17             # raise BaklolError(*consts[arg])
+HALT = 18              # end of program
+TAIL_CALL = 19         # 'bhej f(...)': enter the pending call in place of the current frame
+NEGATE = 20            # replace top of stack with 0 - top (unary minus)
+LOOP = 21              # pop, if truthy count one budget step and jump back to arg (jabtak)
+
+OPNAMES = [
+    'LOAD_NAME', 'LOAD_CONST', 'BINARY_OP', 'STORE_NAME', 'CHECK_NAME',
+    'POP_JUMP_IF_FALSE', 'JUMP', 'BEGIN_CALL', 'BIND_ARG', 'CALL', 'RETURN',
+    'RETURN_NONE', 'POP_TOP', 'PRINT', 'DEFINE_FUNC', 'SETUP_BHAUKAAL',
+    'END_BHAUKAAL', 'THROW', 'HALT', 'TAIL_CALL', 'NEGATE', 'LOOP',
+]
+
+# BINARY_OP argument is an index into this list
+BINARY_OP_NAMES = ['PLUS', 'MINUS', 'MUL', 'DIV', 'EQ', 'NEQ', 'GT', 'LT', 'GTE', 'LTE', 'PLUS_NUMBER']
+
+# Bump whenever the instruction set or the serialized layout changes
+BYTECODE_VERSION = 7
+
+class Code:
+    """A compiled unit: flat instruction stream plus constant and name tables."""
+
+    def __init__(self, name="<module>"):
+        self.name = name
+        self.code = []      # [op, arg, op, arg, ...]
+        self.consts = []
+        self.names = []
+        self.lines = {}     # instruction offset -> source line, for ops that can fail or count steps
+        self._const_index = {}
+        self._name_index = {}
+
+    def emit(self, op, arg=0, line=None):
+        if line is not None:
+            self.lines[len(self.code)] = line
+        self.code.append(op)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def patch(self, position, target):
+        self.code[position + 1] = target
+
+    def here(self):
+        return len(self.code)
+
+    def add_const(self, value):
+        # Keyed by type too, so 1, 1.0 and sahi stay separate constants
+        key = (type(value), value)
+        if key not in self._const_index:
+            self.consts.append(value)
+            self._const_index[key] = len(self.consts) - 1
+        return self._const_index[key]
+
+    def add_name(self, name):
+        if name not in self._name_index:
+            self.names.append(name)
+            self._name_index[name] = len(self.names) - 1
+        return self._name_index[name]
+
+    def __repr__(self):
+        return f"Code({self.name}, {len(self.code) // 2} instructions)"
+
+class Function:
+    """A compiled kaam/rangbaaj function, stored in the constant table."""
+
+    def __init__(self, name, params, code, is_expert=False, memoize=False, impurity=None, line=0):
+        self.name = name
+        self.params = params
+        self.code = code
+        self.is_expert = is_expert
+        # From memo.check_purity on the FunctionDecl
+        self.memoize = memoize
+        self.impurity = impurity
+        self.line = line
+
+    def __repr__(self):
+        return f"Function({self.name}, {self.params})"
+
+# --- Compiler ---
+class Compiler:
+    """Compiles the AST from Parser.parse() into a Code object for vm.VM."""
+
+    def __init__(self):
+        self.code = None
+        self.in_function = False
+        self.bhaukaal_depth = 0
+
+    def compile(self, tree):
+        self.code = Code()
+        self.visit(tree)
+        self.code.emit(HALT)
+        return self.code
+
+    def visit(self, node):
+        if isinstance(node, list):
+            for stmt in node:
+                self.visit_statement(stmt)
+            return
+        method_name = 'compile_' + type(node).__name__
+        compiler = getattr(self, method_name, self.generic_compile)
+        return compiler(node)
+
+    def visit_statement(self, node):
+        self.visit(node)
+        # A call used as a statement leaves its result on the stack
+        if isinstance(node, FunctionCall):
+            self.code.emit(POP_TOP)
+
+    def generic_compile(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    def compile_Num(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_const(node.value))
+
+    def compile_String(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_const(node.value))
+
+    def compile_Boolean(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_const(node.value))
+
+    def compile_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.code.emit(BINARY_OP, BINARY_OP_NAMES.index(op_name(node)))
+
+    def compile_Negate(self, node):
+        self.visit(node.expression)
+        self.code.emit(NEGATE)
+
+    def compile_VarDecl(self, node):
+        self.visit(node.expression)
+        self.code.emit(STORE_NAME, self.code.add_name(node.var_name))
+
+    def compile_VarAccess(self, node):
+        self.code.emit(LOAD_NAME, self.code.add_name(node.var_name), node.line)
+
+    def compile_VarAssign(self, node):
+        name_idx = self.code.add_name(node.left.var_name)
+        self.code.emit(CHECK_NAME, name_idx, node.line)
+        self.visit(node.right)
+        self.code.emit(STORE_NAME, name_idx)
+
+    def compile_Print(self, node):
+        self.visit(node.expression)
+        self.code.emit(PRINT)
+
+    def compile_IfBlock(self, node):
+        self.visit(node.condition)
+        jump_to_else = self.code.emit(POP_JUMP_IF_FALSE)
+        self.visit(node.body)
+        if node.else_body:
+            jump_to_end = self.code.emit(JUMP)
+            self.code.patch(jump_to_else, self.code.here())
+            self.visit(node.else_body)
+            self.code.patch(jump_to_end, self.code.here())
+        else:
+            self.code.patch(jump_to_else, self.code.here())
+
+    def compile_WhileBlock(self, node):
+        # Condition at the bottom: one LOOP per iteration instead of a
+        # POP_JUMP_IF_FALSE plus a JUMP back
+        jump_to_condition = self.code.emit(JUMP)
+        body_start = self.code.here()
+        self.visit(node.body)
+        self.code.patch(jump_to_condition, self.code.here())
+        self.visit(node.condition)
+        self.code.emit(LOOP, body_start, node.line)
+
+    def compile_BhaukaalBlock(self, node):
+        self.code.emit(SETUP_BHAUKAAL)
+        self.bhaukaal_depth += 1
+        self.visit(node.body)
+        self.bhaukaal_depth -= 1
+        self.code.emit(END_BHAUKAAL)
+
+    def compile_Throw(self, node):
+        self.code.emit(THROW, self.code.add_const((node.message, node.line)))
+
+    def compile_FunctionDecl(self, node):
+        outer = (self.code, self.in_function, self.bhaukaal_depth)
+        self.code = Code(node.name)
+        self.in_function, self.bhaukaal_depth = True, 0
+        self.visit(node.body)
+        self.code.emit(RETURN_NONE)
+        function = Function(node.name, list(node.params), self.code, node.is_expert,
+                            node.memoize, node.impurity, node.line)
+        self.code, self.in_function, self.bhaukaal_depth = outer
+        self.code.emit(DEFINE_FUNC, self.code.add_const(function))
+
+    def compile_FunctionCall(self, node, call_op=CALL):
+        self.code.emit(BEGIN_CALL, self.code.add_const((node.name, len(node.args))), node.line)
+        # Arguments are bound one by one as they are evaluated,
+        # same order as Interpreter.visit_FunctionCall
+        for i, arg in enumerate(node.args):
+            self.visit(arg)
+            self.code.emit(BIND_ARG, i)
+        self.code.emit(call_op)
+
+    def compile_Return(self, node):
+        # A call in tail position reuses the current frame, so tail recursion
+        # runs in constant VM stack. Not inside bhaukaal: the block has to
+        # stay around to wrap errors coming out of the callee.
+        if isinstance(node.expression, FunctionCall) and self.in_function and not self.bhaukaal_depth:
+            self.compile_FunctionCall(node.expression, TAIL_CALL)
+            return
+        self.visit(node.expression)
+        self.code.emit(RETURN)
+
+def compile_program(tree):
+    return Compiler().compile(tree)
+
+# --- Serialization ---
+def _code_to_tuple(code):
+    consts = []
+    for const in code.consts:
+        if isinstance(const, Function):
+            consts.append(('function', const.name, tuple(const.params), const.is_expert,
+                           const.memoize, const.impurity, const.line, _code_to_tuple(const.code)))
+        else:
+            consts.append(('value', const))
+    lines = tuple(sorted(code.lines.items()))
+    return (code.name, array('l', code.code).tobytes(), tuple(consts), tuple(code.names), lines)
+
+def _code_from_tuple(data):
+    name, raw_code, consts, names, lines = data
+    code = Code(name)
+    ops = array('l')
+    ops.frombytes(raw_code)
+    code.code = ops.tolist()
+    for const in consts:
+        if const[0] == 'function':
+            _, func_name, params, is_expert, memoize, impurity, line, body = const
+            code.consts.append(Function(func_name, list(params), _code_from_tuple(body), is_expert,
+                                        memoize, impurity, line))
+        else:
+            code.consts.append(const[1])
+    for name in names:
+        code.add_name(name)
+    code.lines = dict(lines)
+    return code
+
+def dumps(code):
+    """Serialize a Code object (and nested functions) to bytes."""
+    return marshal.dumps((BYTECODE_VERSION, _code_to_tuple(code)))
+
+def loads(data):
+    version, payload = marshal.loads(data)
+    if version != BYTECODE_VERSION:
+        raise ValueError(f"Bytecode version {version} nahi chalega, {BYTECODE_VERSION} chahiye")
+    return _code_from_tuple(payload)
+
+# --- Disassembler ---
+def disassemble(code, indent=""):
+    lines = [f"{indent}Disassembly of {code.name}:"]
+    functions = []
+    for pc in range(0, len(code.code), 2):
+        op, arg = code.code[pc], code.code[pc + 1]
+        name = OPNAMES[op]
+        detail = ""
+        if op in (LOAD_NAME, STORE_NAME, CHECK_NAME):
+            detail = code.names[arg]
+        elif op in (LOAD_CONST, BEGIN_CALL, THROW, DEFINE_FUNC):
+            detail = repr(code.consts[arg])
+            if op == DEFINE_FUNC:
+                functions.append(code.consts[arg])
+        elif op == BINARY_OP:
+            detail = BINARY_OP_NAMES[arg]
+        elif op in (JUMP, POP_JUMP_IF_FALSE, LOOP):
+            detail = f"to {arg}"
+        lines.append(f"{indent}{pc:>6} {name:<18} {arg:<5} {detail}".rstrip())
+    for function in functions:
+        lines.append("")
+        lines.append(disassemble(function.code, indent))
+    return "\n".join(lines)
@@ -0,0 +1,403 @@
+import operator
+from parser import *
+from errors import BaklolError, BhaukaalError, ThakGayaError
+from interpreter import Interpreter, ReturnValue
+from resolver import Resolver, UNSET
+from memo import MISS, check_purity
+from rope import add
+
+# Operator already chosen at compile time, so BinOp never compares strings at runtime
+BINARY_OPS = {
+    'PLUS': add,
+    'PLUS_NUMBER': operator.add,
+    'MINUS': operator.sub,
+    'MUL': operator.mul,
+    'DIV': operator.truediv,
+    'EQ': operator.eq,
+    'NEQ': operator.ne,
+    'GT': operator.gt,
+    'LT': operator.lt,
+    'GTE': operator.ge,
+    'LTE': operator.le,
+}
+
+def op_name(node):
+    """BINARY_OPS key for a BinOp.
+
+    '+' beside a number literal can never join strings, so it is
+    'PLUS_NUMBER' and skips rope.add's type checks.
+    """
+    if node.op.type == 'PLUS' and (type(node.left) is Num or type(node.right) is Num):
+        return 'PLUS_NUMBER'
+    return node.op.type
+
+def call_memoized(memo, arg_vals, body):
+    # Interpreter.call_memoized, for a compiled body
+    key = memo.key(arg_vals)
+    value = memo.get(key)
+    if value is MISS:
+        try:
+            body()
+            value = None
+        except ReturnValue as r:
+            value = r.value
+        memo.put(key, value)
+    return value
+
+class ClosureCompiler:
+    """Turns the AST from Parser.parse() into a tree of pre-bound Python closures.
+
+    Every node is compiled once into a zero-argument function. Running the
+    program is then just calling the root closure, with no 'visit_' name
+    building or getattr lookups on the hot path.
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        # Compiled function bodies, keyed by their FunctionDecl node
+        self.bodies = {}
+
+    def compile(self, node):
+        if isinstance(node, list):
+            return self.compile_list(node)
+        method_name = 'compile_' + type(node).__name__
+        compiler = getattr(self, method_name, self.generic_compile)
+        return compiler(node)
+
+    def generic_compile(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    def compile_list(self, nodes):
+        steps = tuple(self.compile(node) for node in nodes)
+        if len(steps) == 1:
+            return steps[0]
+
+        def run_list():
+            result = None
+            for step in steps:
+                result = step()
+            return result
+        return run_list
+
+    def compile_Num(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_String(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_Boolean(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_BinOp(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        op = BINARY_OPS.get(op_name(node))
+        if op is None:
+            return lambda: (left(), right(), None)[2]
+        return lambda: op(left(), right())
+
+    def compile_Negate(self, node):
+        expression = self.compile(node.expression)
+        return lambda: 0 - expression()
+
+    def compile_VarDecl(self, node):
+        env = self.interpreter.global_env
+        var_name = node.var_name
+        expression = self.compile(node.expression)
+
+        def var_decl():
+            env[var_name] = expression()
+        return var_decl
+
+    def compile_VarAccess(self, node):
+        env = self.interpreter.global_env
+        var_name, line = node.var_name, node.line
+
+        def var_access():
+            try:
+                return env[var_name]
+            except KeyError:
+                raise BaklolError(f"Variable '{var_name}' dhoond rahe ho? Pehle declare to karo!", line) from None
+        return var_access
+
+    def compile_VarAssign(self, node):
+        env = self.interpreter.global_env
+        var_name, line = node.left.var_name, node.line
+        right = self.compile(node.right)
+
+        def var_assign():
+            if var_name in env:
+                env[var_name] = right()
+            else:
+                raise BaklolError(f"Variable '{var_name}' declare nahi kiya hai be.", line)
+        return var_assign
+
+    def compile_Print(self, node):
+        output = self.interpreter.output
+        expression = self.compile(node.expression)
+
+        def print_value():
+            print(expression(), file=output)
+        return print_value
+
+    def compile_IfBlock(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        else_body = self.compile(node.else_body) if node.else_body else None
+
+        if else_body is None:
+            def if_block():
+                if condition():
+                    body()
+        else:
+            def if_block():
+                if condition():
+                    body()
+                else:
+                    else_body()
+        return if_block
+
+    def compile_WhileBlock(self, node):
+        interpreter = self.interpreter
+        budget = interpreter.budget
+        line = node.line
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+
+        def while_block():
+            while condition():
+                interpreter.ticks -= 1
+                if interpreter.ticks < 0:
+                    interpreter.ticks = budget.check(line)
+                body()
+        return while_block
+
+    def compile_BhaukaalBlock(self, node):
+        body = self.compile(node.body)
+
+        def bhaukaal_block():
+            try:
+                body()
+            except ThakGayaError:
+                raise
+            except Exception as e:
+                raise BhaukaalError(f"Bhaukaal machane me galti ho gayi: {str(e)}", 0)
+        return bhaukaal_block
+
+    def compile_Throw(self, node):
+        message, line = node.message, node.line
+
+        def throw():
+            raise BaklolError(message, line)
+        return throw
+
+    def compile_FunctionDecl(self, node):
+        functions = self.interpreter.functions
+        memos = self.interpreter.memos
+        self.bodies[node] = self.compile(node.body)
+
+        def function_decl():
+            functions[node.name] = node
+            memos.declare(node.name, node.is_expert, node.memoize, node.impurity, node.line)
+        return function_decl
+
+    def compile_FunctionCall(self, node):
+        interpreter = self.interpreter
+        budget = interpreter.budget
+        env = interpreter.global_env
+        functions = interpreter.functions
+        memos = interpreter.memos
+        bodies = self.bodies
+        name, line = node.name, node.line
+        args = tuple(self.compile(arg) for arg in node.args)
+        arg_count = len(args)
+
+        def function_call():
+            interpreter.ticks -= 1
+            if interpreter.ticks < 0:
+                interpreter.ticks = budget.check(line)
+            func_def = functions.get(name)
+            if func_def is None:
+                raise BaklolError(f"Function '{name}' kaun banayega? Hum?", line)
+            params = func_def.params
+            if arg_count != len(params):
+                raise BaklolError(f"Function '{name}' maang raha hai {len(params)} arguments, tum diye {arg_count}.", line)
+
+            body = bodies.get(func_def)
+            if body is None:
+                body = bodies[func_def] = self.compile(func_def.body)
+
+            # Same dynamic scoping as Interpreter.visit_FunctionCall:
+            # patch global_env with the params and restore it afterwards
+            old_values = {}
+            for param, arg in zip(params, args):
+                arg_val = arg()
+                if param in env:
+                    old_values[param] = env[param]
+                env[param] = arg_val
+
+            try:
+                if func_def.memoize:
+                    return call_memoized(memos.get(name), [env[param] for param in params], body)
+                body()
+            except ReturnValue as r:
+                return r.value
+            finally:
+                for param in params:
+                    if param in old_values:
+                        env[param] = old_values[param]
+                    else:
+                        del env[param]
+        return function_call
+
+    def compile_Return(self, node):
+        expression = self.compile(node.expression)
+
+        def return_value():
+            raise ReturnValue(expression())
+        return return_value
+
+
+class ClosureInterpreter(Interpreter):
+    """Drop-in replacement for Interpreter that compiles to closures before running."""
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        super().__init__(output, max_steps, timeout)
+        self.compiler = ClosureCompiler(self)
+
+    def visit(self, node):
+        return self.compiler.compile(node)()
+
+
+class LexicalClosureCompiler(ClosureCompiler):
+    """ClosureCompiler for programs annotated by resolver.Resolver.
+
+    Variables live in array frames instead of global_env. The running frame
+    is kept in interpreter.cell[0], so closures compiled once can be shared
+    by every call.
+    """
+
+    def compile_VarDecl(self, node):
+        cell = self.interpreter.cell
+        slot = node.slot
+        expression = self.compile(node.expression)
+
+        def var_decl():
+            cell[0][slot] = expression()
+        return var_decl
+
+    def compile_VarAccess(self, node):
+        cell = self.interpreter.cell
+        var_name, depth, slot, line = node.var_name, node.depth, node.slot, node.line
+
+        def undeclared():
+            raise BaklolError(f"Variable '{var_name}' dhoond rahe ho? Pehle declare to karo!", line)
+
+        if depth < 0:
+            return undeclared
+        if depth == 0:
+            def var_access():
+                value = cell[0][slot]
+                if value is UNSET:
+                    undeclared()
+                return value
+        else:
+            def var_access():
+                frame = cell[0]
+                for _ in range(depth):
+                    frame = frame[0]
+                value = frame[slot]
+                if value is UNSET:
+                    undeclared()
+                return value
+        return var_access
+
+    def compile_VarAssign(self, node):
+        cell = self.interpreter.cell
+        var_name, depth, slot, line = node.left.var_name, node.depth, node.slot, node.line
+        right = self.compile(node.right)
+
+        def var_assign():
+            if depth < 0:
+                frame = None
+            else:
+                frame = cell[0]
+                for _ in range(depth):
+                    frame = frame[0]
+            if frame is None or frame[slot] is UNSET:
+                raise BaklolError(f"Variable '{var_name}' declare nahi kiya hai be.", line)
+            frame[slot] = right()
+        return var_assign
+
+    def compile_FunctionDecl(self, node):
+        cell = self.interpreter.cell
+        functions = self.interpreter.functions
+        memos = self.interpreter.memos
+        self.bodies[node] = self.compile(node.body)
+
+        def function_decl():
+            functions[node.name] = (node, cell[0])
+            memos.declare(node.name, node.is_expert, node.memoize, node.impurity, node.line)
+        return function_decl
+
+    def compile_FunctionCall(self, node):
+        interpreter = self.interpreter
+        budget = interpreter.budget
+        cell = interpreter.cell
+        functions = interpreter.functions
+        memos = interpreter.memos
+        bodies = self.bodies
+        name, line = node.name, node.line
+        args = tuple(self.compile(arg) for arg in node.args)
+        arg_count = len(args)
+
+        def function_call():
+            interpreter.ticks -= 1
+            if interpreter.ticks < 0:
+                interpreter.ticks = budget.check(line)
+            entry = functions.get(name)
+            if entry is None:
+                raise BaklolError(f"Function '{name}' kaun banayega? Hum?", line)
+            func_def, parent_frame = entry
+            if arg_count != len(func_def.params):
+                raise BaklolError(f"Function '{name}' maang raha hai {len(func_def.params)} arguments, tum diye {arg_count}.", line)
+
+            frame = func_def.empty_frame.copy()
+            frame[0] = parent_frame
+            for slot, arg in zip(func_def.param_slots, args):
+                frame[slot] = arg()
+
+            caller_frame = cell[0]
+            cell[0] = frame
+            try:
+                if func_def.memoize:
+                    arg_vals = [frame[slot] for slot in func_def.param_slots]
+                    return call_memoized(memos.get(name), arg_vals, bodies[func_def])
+                bodies[func_def]()
+            except ReturnValue as r:
+                return r.value
+            finally:
+                cell[0] = caller_frame
+        return function_call
+
+
+class LexicalClosureInterpreter(ClosureInterpreter):
+    """ClosureInterpreter with lexical scoping, see resolver.LexicalInterpreter."""
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        Interpreter.__init__(self, output, max_steps, timeout)
+        self.cell = [None]
+        self.compiler = LexicalClosureCompiler(self)
+
+    def prepare(self, tree):
+        program = Resolver().resolve(tree)
+        check_purity(program.tree, lexical=True)
+        return program
+
+    def run_prepared(self, program):
+        self.cell[0] = [None] + [UNSET] * (program.global_frame_size - 1)
+        self.ticks = self.budget.start()
+        return self.compiler.compile(program.tree)()
@@ -0,0 +1,224 @@
+from array import array
+from parser import *
+from lexer import Token, OPERATORS
+
+# Node kind codes, an index into this list. Nodes that only differ in a flag
+# get their own code (EXPERT_FUNCTION) instead of another column.
+NODE_TYPES = [
+    Num, String, Boolean, BinOp, Negate, VarAccess, VarAssign, VarDecl, Print,
+    IfBlock, WhileBlock, BhaukaalBlock, NoOp, FunctionDecl, FunctionCall, Return, Throw,
+]
+KIND = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+EXPERT_FUNCTION = len(NODE_TYPES)   # rangbaaj, a FunctionDecl with is_expert
+NESTED_BLOCK = EXPERT_FUNCTION + 1  # a bare { ... } statement, parsed as a plain list
+
+# BinOp stores its operator as an index, the symbol is rebuilt on unpack
+OP_TYPES = list(OPERATORS.values())
+OP_SYMBOLS = {op_type: symbol for symbol, op_type in OPERATORS.items()}
+
+NONE = -1   # column value for a missing else_body
+
+class PackedAST:
+    """Struct-of-arrays encoding of a parsed program.
+
+    Node i is kinds[i] plus up to three int operands a[i], b[i], c[i] and its
+    line; operands index other nodes, the consts/names tables, or a block (a
+    run of node or name indices for a statement list, argument list or
+    params, stored flat in block_items and sliced by block_ends). Children
+    are always stored before their parent, so unpack() is a single forward
+    loop. That is 17 bytes of columns per node instead of a Python object,
+    which makes it the form to keep parsed programs around in. Resolver
+    annotations and purity checks are not kept: pack before prepare().
+    """
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.a = array('i')
+        self.b = array('i')
+        self.c = array('i')
+        self.lines = array('i')
+        self.consts = []
+        self.names = []
+        self.block_items = array('i')
+        self.block_ends = array('i')
+        self.root = NONE
+        self._const_index = {}
+        self._name_index = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __repr__(self):
+        return f"PackedAST({len(self)} nodes, {self.nbytes()} bytes)"
+
+    def nbytes(self):
+        """Size of the node columns, not counting the shared consts/names."""
+        columns = (self.kinds, self.a, self.b, self.c, self.lines, self.block_items, self.block_ends)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def add_const(self, value):
+        # Keyed by type too, like bytecode.Code.add_const
+        key = (type(value), value)
+        if key not in self._const_index:
+            self.consts.append(value)
+            self._const_index[key] = len(self.consts) - 1
+        return self._const_index[key]
+
+    def add_name(self, name):
+        if name not in self._name_index:
+            self.names.append(name)
+            self._name_index[name] = len(self.names) - 1
+        return self._name_index[name]
+
+    def add_block(self, indices):
+        # Children are packed first, so collect them before extending block_items
+        self.block_items.extend(list(indices))
+        self.block_ends.append(len(self.block_items))
+        return len(self.block_ends) - 1
+
+    def block(self, index):
+        start = self.block_ends[index - 1] if index else 0
+        return self.block_items[start:self.block_ends[index]]
+
+    def add_node(self, kind, a=0, b=0, c=0, line=0):
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        self.lines.append(line)
+        return len(self.kinds) - 1
+
+    def unpack(self):
+        return unpack(self)
+
+# --- Packing ---
+class Packer:
+    def __init__(self):
+        self.packed = PackedAST()
+
+    def pack(self, tree):
+        self.packed.root = self.block(tree)
+        return self.packed
+
+    def block(self, nodes):
+        return self.packed.add_block(self.visit(node) for node in nodes)
+
+    def visit(self, node):
+        if isinstance(node, list):
+            return self.packed.add_node(NESTED_BLOCK, self.block(node))
+        method_name = 'pack_' + type(node).__name__
+        packer = getattr(self, method_name, self.generic_pack)
+        return packer(node)
+
+    def generic_pack(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    def pack_literal(self, node):
+        return self.packed.add_node(KIND[type(node)], self.packed.add_const(node.value), line=node.line)
+
+    pack_Num = pack_String = pack_Boolean = pack_literal
+
+    def pack_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        return self.packed.add_node(KIND[BinOp], left, OP_TYPES.index(node.op.type), right, node.op.line)
+
+    def pack_Negate(self, node):
+        return self.packed.add_node(KIND[Negate], self.visit(node.expression), line=node.line)
+
+    def pack_VarAccess(self, node):
+        return self.packed.add_node(KIND[VarAccess], self.packed.add_name(node.var_name), line=node.line)
+
+    def pack_VarAssign(self, node):
+        left = self.visit(node.left)
+        return self.packed.add_node(KIND[VarAssign], left, self.visit(node.right))
+
+    def pack_VarDecl(self, node):
+        expression = self.visit(node.expression)
+        return self.packed.add_node(KIND[VarDecl], self.packed.add_name(node.var_name), expression, line=node.line)
+
+    def pack_Print(self, node):
+        return self.packed.add_node(KIND[Print], self.visit(node.expression), line=node.line)
+
+    def pack_Return(self, node):
+        return self.packed.add_node(KIND[Return], self.visit(node.expression), line=node.line)
+
+    def pack_IfBlock(self, node):
+        condition = self.visit(node.condition)
+        body = self.block(node.body)
+        else_body = self.block(node.else_body) if node.else_body else NONE
+        return self.packed.add_node(KIND[IfBlock], condition, body, else_body, node.line)
+
+    def pack_WhileBlock(self, node):
+        condition = self.visit(node.condition)
+        return self.packed.add_node(KIND[WhileBlock], condition, self.block(node.body), line=node.line)
+
+    def pack_BhaukaalBlock(self, node):
+        return self.packed.add_node(KIND[BhaukaalBlock], self.block(node.body), line=node.line)
+
+    def pack_NoOp(self, node):
+        return self.packed.add_node(KIND[NoOp])
+
+    def pack_FunctionDecl(self, node):
+        kind = EXPERT_FUNCTION if node.is_expert else KIND[FunctionDecl]
+        params = self.packed.add_block(self.packed.add_name(param) for param in node.params)
+        return self.packed.add_node(kind, self.packed.add_name(node.name), params, self.block(node.body), node.line)
+
+    def pack_FunctionCall(self, node):
+        args = self.block(node.args)
+        return self.packed.add_node(KIND[FunctionCall], self.packed.add_name(node.name), args, line=node.line)
+
+    def pack_Throw(self, node):
+        return self.packed.add_node(KIND[Throw], self.packed.add_const(node.message), line=node.line)
+
+def pack(tree):
+    """Encodes the statement list from Parser.parse() as a PackedAST."""
+    return Packer().pack(tree)
+
+# --- Unpacking ---
+def unpack(packed):
+    """Rebuilds the object AST, equal to the tree that was packed."""
+    consts, names, block = packed.consts, packed.names, packed.block
+    nodes = []
+    for kind, a, b, c, line in zip(packed.kinds, packed.a, packed.b, packed.c, packed.lines):
+        if kind == NESTED_BLOCK:
+            nodes.append([nodes[j] for j in block(a)])
+            continue
+        node_type = FunctionDecl if kind == EXPERT_FUNCTION else NODE_TYPES[kind]
+
+        if node_type is Num:
+            node = Num(Token("INTEGER" if isinstance(consts[a], int) else "FLOAT", consts[a], line))
+        elif node_type is String:
+            node = String(Token("STRING", consts[a], line))
+        elif node_type is Boolean:
+            node = Boolean(Token("BOOLEAN", consts[a], line))
+        elif node_type is BinOp:
+            op_type = OP_TYPES[b]
+            node = BinOp(nodes[a], Token(op_type, OP_SYMBOLS[op_type], line), nodes[c])
+        elif node_type is VarAccess:
+            node = VarAccess(Token("IDENTIFIER", names[a], line))
+        elif node_type is VarAssign:
+            node = VarAssign(nodes[a], nodes[b])
+        elif node_type is VarDecl:
+            node = VarDecl(names[a], nodes[b], line)
+        elif node_type is IfBlock:
+            else_body = [nodes[j] for j in block(c)] if c != NONE else None
+            node = IfBlock(nodes[a], [nodes[j] for j in block(b)], else_body, line)
+        elif node_type is WhileBlock:
+            node = WhileBlock(nodes[a], [nodes[j] for j in block(b)], line)
+        elif node_type is BhaukaalBlock:
+            node = BhaukaalBlock([nodes[j] for j in block(a)], line)
+        elif node_type is NoOp:
+            node = NoOp()
+        elif node_type is FunctionDecl:
+            params = [names[j] for j in block(b)]
+            node = FunctionDecl(names[a], params, [nodes[j] for j in block(c)], kind == EXPERT_FUNCTION, line)
+        elif node_type is FunctionCall:
+            node = FunctionCall(names[a], [nodes[j] for j in block(b)], line)
+        elif node_type is Throw:
+            node = Throw(Token("STRING", consts[a], line))
+        else:
+            # Print, Return, Negate: a single expression operand
+            node = node_type(nodes[a], line)
+        nodes.append(node)
+    return [nodes[j] for j in block(packed.root)]
@@ -0,0 +1,248 @@
+"""Warm kanp.py process that runs scripts for kanp_client.py over a Unix socket.
+
+Usage: python daemon.py [--socket PATH] [--stop]
+
+The daemon imports every module and warms each backend once, then listens
+on SOCKET_PATH (KANP_DAEMON_SOCKET, by default one per user under
+XDG_RUNTIME_DIR or the temp dir). The socket lives in a 0700 directory of
+the user's own, and both ends check the other's user id where the OS can
+tell it. Each connection is one kanp.py run: the client sends its
+arguments and current directory, and a child forked from the warm daemon
+runs kanp.main() there, streaming stdout and stderr back and ending with
+the exit status. Forking per run means runs never share state and a
+crashing script cannot take the daemon down.
+
+KANP_* settings are read once, from the daemon's environment, not the
+client's. When a .py file next to this one changes, the daemon exits and
+the client runs that script itself, so code changes are never missed.
+--stop asks a running daemon to exit.
+"""
+import io
+import os
+import sys
+import stat
+import time
+import signal
+import argparse
+import threading
+import traceback
+import socketserver
+
+# Imported here, once, so no run pays for it
+import kanp
+from backends import BACKENDS, get_backend
+from lexer import FastLexer
+from parser import Parser
+from kanp_client import SOCKET_PATH, connect, peer_uid, frame, read_frame, RUN, STOP, STDOUT, STDERR, EXIT, RESTART
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+WARM_UP = '''hum_rakhte_hain i = 0
+kaam jod(a, b) { bhej a + b }
+jabtak i < 3 { i = jod(i, 1) }
+bol i
+'''
+
+def source_stamp():
+    """Modification times of the interpreter's own .py files."""
+    stamp = {}
+    for name in os.listdir(SOURCE_DIR):
+        if name.endswith(".py"):
+            try:
+                stamp[name] = os.stat(os.path.join(SOURCE_DIR, name)).st_mtime_ns
+            except OSError:
+                pass
+    return stamp
+
+def warm_up():
+    # First runs fill lazy caches (method lookups, compiled regexes) before the first fork
+    for name in BACKENDS:
+        interpreter = get_backend(name)(output=io.StringIO())
+        interpreter.run_prepared(interpreter.prepare(Parser(FastLexer(WARM_UP).tokenize()).parse()))
+
+class Replies:
+    """A client's stdout and stderr text, sent in order as frames.
+
+    Batched like server.ChunkedOutput: the first line goes out at once,
+    then text is sent once chunk_bytes have built up or at the end of a
+    line flush_interval seconds after the last send.
+    """
+
+    def __init__(self, wfile, chunk_bytes=4096, flush_interval=0.05):
+        self.wfile = wfile
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.pending = []   # [frame kind, [text, ...]], consecutive writes to one stream merged
+        self.buffered = 0
+        self.last_flush = None
+
+    def write(self, kind, text):
+        if self.pending and self.pending[-1][0] == kind:
+            self.pending[-1][1].append(text)
+        else:
+            self.pending.append([kind, [text]])
+        self.buffered += len(text)
+        if self.buffered >= self.chunk_bytes:
+            self.flush()
+        elif text.endswith("\n") and (self.last_flush is None or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            frames = [frame(kind, "".join(texts).encode("utf-8")) for kind, texts in self.pending]
+            self.pending.clear()
+            self.buffered = 0
+            self.send(*frames)
+        self.last_flush = time.monotonic()
+
+    def send(self, *frames):
+        try:
+            self.wfile.write(b"".join(frames))
+            self.wfile.flush()
+        except OSError:
+            os._exit(1)  # The client is gone, nobody is waiting for this run
+
+class ClientStream:
+    """sys.stdout or sys.stderr of a run, written to the client."""
+
+    encoding = "utf-8"
+
+    def __init__(self, replies, kind):
+        self.replies = replies
+        self.kind = kind
+
+    def write(self, text):
+        self.replies.write(self.kind, text)
+        return len(text)
+
+    def flush(self):
+        self.replies.flush()
+
+    def isatty(self):
+        return False
+
+def watch_client(rfile):
+    """Ends this run as soon as the client disconnects (e.g. Ctrl+C), even in an endless jabtak."""
+    def run():
+        rfile.read(1)  # The client sends nothing more, so this only returns at EOF
+        os._exit(1)
+    threading.Thread(target=run, name="client-watch", daemon=True).start()
+
+def run_kanp(argv, cwd, replies):
+    """kanp.main(argv) in cwd with output going to replies; its exit status."""
+    os.chdir(cwd)
+    sys.stdout = ClientStream(replies, STDOUT)
+    sys.stderr = ClientStream(replies, STDERR)
+    try:
+        return kanp.main(argv) or 0
+    except SystemExit as e:  # argparse errors and --help
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+class RunHandler(socketserver.StreamRequestHandler):
+    # Runs in the forked child
+    def handle(self):
+        kind, payload = read_frame(self.rfile)
+        replies = Replies(self.wfile)
+        if kind == STOP:
+            os.kill(self.server.parent_pid, signal.SIGTERM)
+            replies.send(frame(EXIT, b"0"))
+            return
+        if kind != RUN:
+            return
+        if source_stamp() != self.server.stamp:
+            os.kill(self.server.parent_pid, signal.SIGTERM)
+            replies.send(frame(RESTART))
+            return
+        cwd, *argv = [os.fsdecode(arg) for arg in payload.split(b"\0")]
+        watch_client(self.rfile)
+        status = run_kanp(argv, cwd, replies)
+        replies.flush()
+        replies.send(frame(EXIT, str(status).encode("ascii")))
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """UnixStreamServer that forks a warm child for every connection."""
+
+    def __init__(self, path):
+        self.parent_pid = os.getpid()
+        self.stamp = source_stamp()
+        super().__init__(path, RunHandler)
+
+    def server_bind(self):
+        # Created 0600 by bind() itself, not chmod()ed afterwards
+        umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def verify_request(self, request, client_address):
+        # Only this user's clients, before anything is forked or read
+        uid = peer_uid(request)
+        return uid is None or uid == os.getuid()
+
+def make_socket_dir(path):
+    """Creates the socket's directory, private to this user; raises OSError if someone else owns it or may enter it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{directory} sirf tumhara (0700) folder hona chahiye")
+
+def stop(path):
+    sock = connect(path)
+    if sock is None:
+        print(f"Koi daemon nahi chal raha ({path})")
+        return 1
+    with sock:
+        sock.sendall(frame(STOP))
+        sock.recv(1024)
+    print(f"Daemon band kar diya ({path})")
+    return 0
+
+def _terminate(signum, frame):
+    raise SystemExit(0)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path (default: %(default)s)")
+    arg_parser.add_argument("--stop", action="store_true", help="stop the daemon listening on the socket")
+    args = arg_parser.parse_args(argv)
+    if args.stop:
+        return stop(args.socket)
+
+    try:
+        make_socket_dir(args.socket)
+    except OSError as e:
+        print(f"❌ Error: Socket ka folder theek nahi hai: {e}", file=sys.stderr)
+        return 1
+    if os.path.exists(args.socket):
+        sock = connect(args.socket)
+        if sock is not None:
+            sock.close()
+            print(f"❌ Error: Daemon pehle se chal raha hai ({args.socket})", file=sys.stderr)
+            return 1
+        os.unlink(args.socket)  # Left behind by a daemon that died
+
+    warm_up()
+    signal.signal(signal.SIGTERM, _terminate)
+    server = DaemonServer(args.socket)
+    print(f"KanpScript daemon listening on {args.socket} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
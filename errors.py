@@ -15,6 +15,11 @@ class BhaukaalError(KanpError):
     def __init__(self, message, line_num):
         super().__init__(message, line_num, "BhaukaalError (Serious System Fail)")
 
+class ThakGayaError(KanpError):
+    # Step budget or deadline used up (see interpreter.Budget)
+    def __init__(self, message, line_num):
+        super().__init__(message, line_num, "ThakGayaError (Budget khatam)")
+
 class GyaanPelWarning(KanpError):
     def __init__(self, message, line_num):
         super().__init__(message, line_num, "GyaanPelWarning")
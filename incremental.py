@@ -0,0 +1,231 @@
+import re
+import time
+from parser import *
+from lexer import Token, FastLexer, KEYWORDS, BOOLEANS
+from errors import BaklolError, KanpError
+from program_cache import ProgramCache
+
+# Token types Parser.statement() can begin a statement with (IDENTIFIER and
+# LBRACE too). None of them can continue an expression or statement, which
+# is what makes the start of a line that begins with one a safe place to cut.
+STATEMENT_STARTS = {"VAR_DECL", "PRINT", "IF", "WHILE", "ADVANCED_BLOCK", "THROW_ERROR",
+                    "RETURN", "FUNCTION", "EXPERT_FUNC"}
+
+# What the splitter has to see: strings (they may hold braces and newlines), braces,
+# and at the top level newlines. Inside a block it only looks for the closing brace.
+TOP_LEVEL = re.compile(r'"[^"]*"|["{}\n]')
+IN_BLOCK = re.compile(r'"[^"]*"|["{}]')
+LINE_START = re.compile(r"[ \t\r\x0b\x0c\x1c-\x1f]*(?:([A-Za-z_][A-Za-z0-9_]*)|\{)")
+
+# Fragment cache entry for a fragment that does not parse on its own
+UNPARSABLE = "unparsable"
+
+def starts_statement(word):
+    if word in BOOLEANS:
+        return False
+    token_type = KEYWORDS.get(word)
+    return token_type is None or token_type in STATEMENT_STARTS
+
+def split_statements(source):
+    """Where source's top-level statements start: [(offset, lines before it), ...].
+
+    A cut goes at the start of a line outside any string or { } block whose
+    first word begins a statement. Line counts skip newlines inside strings,
+    as the lexer's do. After an unclosed '"' or a '}' with no '{' the rest
+    stays in one piece, so it fails (or stops) exactly as Parser would.
+    """
+    starts = [(0, 0)]
+    depth = 0
+    pos = 0
+    newlines = 0        # in source[:counted]
+    counted = 0
+    string_newlines = 0
+    while True:
+        match = (IN_BLOCK if depth else TOP_LEVEL).search(source, pos)
+        if match is None:
+            break
+        pos = match.end()
+        char = source[match.start()]
+        if char == '"':
+            if pos - match.start() == 1:
+                break
+            string_newlines += match.group().count("\n")
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                break
+        else:
+            word = LINE_START.match(source, pos)
+            if word is not None and (word.group(1) is None or starts_statement(word.group(1))):
+                newlines += source.count("\n", counted, pos)
+                counted = pos
+                starts.append((pos, newlines - string_newlines))
+    return starts
+
+def parse_fragment(text, times=None):
+    """Fragment cache entry for text: its statements, a lexer error or UNPARSABLE."""
+    start = time.perf_counter()
+    try:
+        tokens = FastLexer(text).tokenize()
+    except KanpError as e:
+        return e.with_traceback(None)
+    finally:
+        if times is not None:
+            times["lex"] += time.perf_counter() - start
+    parser = Parser(tokens)
+    try:
+        tree = parser.parse()
+    except Exception:
+        return UNPARSABLE
+    if parser.current_token.type != "EOF":
+        return UNPARSABLE  # Stopped at a stray '}'
+    return tree
+
+class Copier:
+    """Fresh copy of a parsed tree with every line moved by offset.
+
+    Cached fragments are templates that never leave the cache: prepare()
+    passes annotate the tree they get (check_purity, the Resolver) and the
+    specializing backend rewrites node classes, so every parse hands out
+    its own nodes. Copying is a fraction of what lexing and parsing cost.
+    Only the fields Parser sets are copied.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        new = object.__new__
+        self.new = new
+        copiers = {cls: getattr(self, "copy_" + cls.__name__) for cls in (
+            list, Num, String, Boolean, BinOp, VarAccess, VarAssign, VarDecl, Print, Return,
+            IfBlock, WhileBlock, BhaukaalBlock, FunctionDecl, FunctionCall, Throw)}
+
+        def copy(node):
+            return copiers[type(node)](node)
+        # An instance attribute, as in QuickeningInterpreter.visit: no method lookup per node
+        self.copy = copy
+
+    def copy_list(self, nodes):
+        copy = self.copy
+        return [copy(node) for node in nodes]
+
+    def copy_literal(self, node):
+        copy = self.new(type(node))
+        copy.value = node.value
+        copy.line = node.line + self.offset
+        return copy
+
+    copy_Num = copy_String = copy_Boolean = copy_literal
+
+    def copy_BinOp(self, node):
+        copy = self.new(BinOp)
+        copy.left = self.copy(node.left)
+        op = node.op
+        copy.op = Token(op.type, op.value, op.line + self.offset)
+        copy.right = self.copy(node.right)
+        copy.line = node.line + self.offset
+        return copy
+
+    def copy_VarAccess(self, node):
+        copy = self.new(VarAccess)
+        copy.var_name = node.var_name
+        copy.line = node.line + self.offset
+        return copy
+
+    def copy_VarAssign(self, node):
+        return VarAssign(self.copy_VarAccess(node.left), self.copy(node.right))
+
+    def copy_VarDecl(self, node):
+        return VarDecl(node.var_name, self.copy(node.expression), node.line + self.offset)
+
+    def copy_expression(self, node):
+        return type(node)(self.copy(node.expression), node.line + self.offset)
+
+    copy_Print = copy_Return = copy_expression
+
+    def copy_IfBlock(self, node):
+        else_body = None if node.else_body is None else self.copy_list(node.else_body)
+        return IfBlock(self.copy(node.condition), self.copy_list(node.body), else_body, node.line + self.offset)
+
+    def copy_WhileBlock(self, node):
+        return WhileBlock(self.copy(node.condition), self.copy_list(node.body), node.line + self.offset)
+
+    def copy_BhaukaalBlock(self, node):
+        return BhaukaalBlock(self.copy_list(node.body), node.line + self.offset)
+
+    def copy_FunctionDecl(self, node):
+        return FunctionDecl(node.name, node.params, self.copy_list(node.body), node.is_expert, node.line + self.offset)
+
+    def copy_FunctionCall(self, node):
+        return FunctionCall(node.name, self.copy_list(node.args), node.line + self.offset)
+
+    def copy_Throw(self, node):
+        copy = self.new(Throw)
+        copy.message = node.message
+        copy.line = node.line + self.offset
+        return copy
+
+class IncrementalParser:
+    """Parser.parse() for a source that keeps coming back with small edits.
+
+    The source is split at its top-level statements (split_statements) and
+    each one is lexed and parsed on its own, cached by its text. An edit
+    only re-parses the statements it touched; the rest are copied out of
+    the cache with their lines moved to where they are now. A statement
+    that does not parse on its own (an incomplete edit, or one that really
+    continues onto the next line) is parsed together with everything after
+    it, which is exactly what Parser does from there. So the tree, and any
+    error with its line, is the same as Parser(FastLexer(source).tokenize())
+    .parse() gives. Safe to share between request threads.
+    """
+
+    def __init__(self, max_entries=16384, max_bytes=16 * 1024 * 1024):
+        # fragment text -> entry; the byte limit counts fragment source, like ProgramCache's
+        self.fragments = ProgramCache(max_entries, max_bytes)
+        self.tail_parses = 0
+
+    def parse(self, source, times=None):
+        """Tree of source. Seconds spent lexing are added to times["lex"] when times is given."""
+        starts = split_statements(source)
+        entries = []
+        for i, (start, line_offset) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(source)
+            text = source[start:end]
+            entry = self.fragments.get(text)
+            if entry is None:
+                entry = parse_fragment(text, times)
+                self.fragments.put(text, entry, len(text))
+            entries.append(entry)
+
+        # The whole source is lexed before anything is parsed, so the first lexer error wins
+        for entry, (start, line_offset) in zip(entries, starts):
+            if isinstance(entry, KanpError):
+                raise BaklolError(entry.message, entry.line_num + line_offset)
+
+        tree = []
+        copier = Copier()
+        for entry, (start, line_offset) in zip(entries, starts):
+            if entry is UNPARSABLE:
+                self.tail_parses += 1
+                tree.extend(self.parse_tail(source[start:], line_offset, times))
+                break
+            copier.offset = line_offset
+            tree.extend(copier.copy_list(entry))
+        return tree
+
+    def parse_tail(self, text, line_offset, times=None):
+        start = time.perf_counter()
+        try:
+            tokens = FastLexer(text).tokenize()
+        finally:
+            if times is not None:
+                times["lex"] += time.perf_counter() - start
+        for token in tokens:
+            token.line += line_offset
+        return Parser(tokens).parse()
+
+    def stats(self):
+        stats = self.fragments.stats()
+        stats["tail_parses"] = self.tail_parses
+        return stats
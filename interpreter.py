@@ -1,20 +1,87 @@
+import sys
+import time
 from parser import *
-from errors import BaklolError, BhaukaalError
+from errors import BaklolError, BhaukaalError, ThakGayaError
+from memo import MemoTable, MISS, check_purity
+from rope import add
+
+# Bump when evaluation semantics change, so cached programs are not reused
+INTERPRETER_VERSION = "2"
 
 class ReturnValue(Exception):
     def __init__(self, value):
         self.value = value
 
+class Budget:
+    """Step budget and deadline for one run, shared by every backend.
+
+    A step is one loop iteration or one function call. Backends count
+    interpreter.ticks down by one per step and only call check() once it
+    drops below zero, so the hot path is a decrement and a compare. check()
+    charges the finished chunk of steps, reads the clock and returns the
+    ticks for the next chunk, or raises ThakGayaError.
+    """
+
+    # Steps between clock reads when there is a deadline
+    CHUNK = 4096
+
+    def __init__(self, max_steps=None, timeout=None):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.steps = 0
+        self.chunk = 0
+        self.deadline = None
+
+    @property
+    def enabled(self):
+        return self.max_steps is not None or self.timeout is not None
+
+    def start(self):
+        self.steps = 0
+        self.deadline = time.monotonic() + self.timeout if self.timeout else None
+        return self.next_chunk()
+
+    def next_chunk(self):
+        chunk = self.CHUNK if self.deadline is not None else sys.maxsize
+        if self.max_steps is not None:
+            chunk = min(chunk, self.max_steps - self.steps)
+        self.chunk = chunk
+        return chunk
+
+    def check(self, line):
+        self.steps += self.chunk
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            raise ThakGayaError(f"Bas karo bhai, {self.max_steps} steps ho gaye. Ye loop kabhi khatam hoga?", line)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise ThakGayaError(f"{self.timeout}s ho gaye, ab aur nahi chalega.", line)
+        # The step that ran out counts against the new chunk
+        return self.next_chunk() - 1
+
 class Interpreter:
-    def __init__(self):
+    def __init__(self, output=None, max_steps=None, timeout=None):
         self.global_env = {}
         self.functions = {} # Store function declarations
+        # Where 'bol' writes: any object with write(), None means sys.stdout.
+        # server.py gives each request its own, so runs never share stdout.
+        self.output = output
+        self.budget = Budget(max_steps, timeout)
+        self.ticks = self.budget.start()
+        # rangbaaj results, and GyaanPelWarnings for the ones that cannot be memoized
+        self.memos = MemoTable()
 
     def visit(self, node):
         method_name = 'visit_' + type(node).__name__
         visitor = getattr(self, method_name, self.generic_visit)
         return visitor(node)
 
+    def prepare(self, tree):
+        # What ProgramCache stores for this backend; the tree-walker runs the AST as is
+        return check_purity(tree)
+
+    def run_prepared(self, program):
+        self.ticks = self.budget.start()
+        return self.visit(program)
+
     def generic_visit(self, node):
         raise Exception(f'No visit_{type(node).__name__} method')
 
@@ -39,7 +106,7 @@ class Interpreter:
         right = self.visit(node.right)
 
         if node.op.type == 'PLUS':
-            return left + right
+            return add(left, right) if type(left) is str else left + right
         elif node.op.type == 'MINUS':
             return left - right
         elif node.op.type == 'MUL':
@@ -59,6 +126,9 @@ class Interpreter:
         elif node.op.type == 'LTE':
             return left <= right
             
+    def visit_Negate(self, node):
+        return 0 - self.visit(node.expression)
+
     def visit_VarDecl(self, node):
         val = self.visit(node.expression)
         self.global_env[node.var_name] = val
@@ -68,7 +138,7 @@ class Interpreter:
         if var_name in self.global_env:
             return self.global_env[var_name]
         else:
-            raise BaklolError(f"Variable '{var_name}' dhoond rahe ho? Pehle declare to karo!", 0)
+            raise BaklolError(f"Variable '{var_name}' dhoond rahe ho? Pehle declare to karo!", node.line)
 
     def visit_VarAssign(self, node):
         var_name = node.left.var_name
@@ -76,11 +146,11 @@ class Interpreter:
             val = self.visit(node.right)
             self.global_env[var_name] = val
         else:
-             raise BaklolError(f"Variable '{var_name}' declare nahi kiya hai be.", 0)
+             raise BaklolError(f"Variable '{var_name}' declare nahi kiya hai be.", node.line)
 
     def visit_Print(self, node):
         val = self.visit(node.expression)
-        print(val)
+        print(val, file=self.output)
     
     def visit_IfBlock(self, node):
         if self.visit(node.condition):
@@ -90,11 +160,17 @@ class Interpreter:
 
     def visit_WhileBlock(self, node):
         while self.visit(node.condition):
+            self.ticks -= 1
+            if self.ticks < 0:
+                self.ticks = self.budget.check(node.line)
             self.visit(node.body)
 
     def visit_BhaukaalBlock(self, node):
         try:
             self.visit(node.body)
+        except ThakGayaError:
+            # Running out of budget is not the program's error to wrap
+            raise
         except Exception as e:
             raise BhaukaalError(f"Bhaukaal machane me galti ho gayi: {str(e)}", 0)
 
@@ -103,14 +179,18 @@ class Interpreter:
         
     def visit_FunctionDecl(self, node):
         self.functions[node.name] = node
+        self.memos.declare(node.name, node.is_expert, node.memoize, node.impurity, node.line)
         
     def visit_FunctionCall(self, node):
+        self.ticks -= 1
+        if self.ticks < 0:
+            self.ticks = self.budget.check(node.line)
         if node.name not in self.functions:
-            raise BaklolError(f"Function '{node.name}' kaun banayega? Hum?", 0)
+            raise BaklolError(f"Function '{node.name}' kaun banayega? Hum?", node.line)
         
         func_def = self.functions[node.name]
         if len(node.args) != len(func_def.params):
-            raise BaklolError(f"Function '{node.name}' maang raha hai {len(func_def.params)} arguments, tum diye {len(node.args)}.", 0)
+            raise BaklolError(f"Function '{node.name}' maang raha hai {len(func_def.params)} arguments, tum diye {len(node.args)}.", node.line)
             
         # Create local scope
         # For simplicity, we will save global_env, update it with params, then restore it.
@@ -135,6 +215,9 @@ class Interpreter:
             self.global_env[param] = arg_val
             
         try:
+            if func_def.memoize:
+                arg_vals = [self.global_env[param] for param in func_def.params]
+                return self.call_memoized(self.memos.get(node.name), arg_vals, func_def.body)
             self.visit(func_def.body)
         except ReturnValue as r:
             return r.value
@@ -146,6 +229,18 @@ class Interpreter:
                 else:
                     del self.global_env[param]
 
+    def call_memoized(self, memo, arg_vals, body):
+        key = memo.key(arg_vals)
+        value = memo.get(key)
+        if value is MISS:
+            try:
+                self.visit(body)
+                value = None
+            except ReturnValue as r:
+                value = r.value
+            memo.put(key, value)
+        return value
+
     def visit_Return(self, node):
         val = self.visit(node.expression)
         raise ReturnValue(val)
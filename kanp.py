@@ -1,37 +1,203 @@
+import os
+import io
 import sys
-from lexer import Lexer
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from lexer import generate_tokens, read_chunks
 from parser import Parser
-from interpreter import Interpreter
+from backends import BACKENDS, DEFAULT_BACKEND, SCOPINGS, DEFAULT_SCOPING, get_backend
+from optimizer import optimize
+import kanpc
+from profiler import get_profiler
 from errors import KanpError
 
-def run_script(filename):
+def run_script(filename, backend=DEFAULT_BACKEND, stream=False, scoping=DEFAULT_SCOPING, optimize_ast=False,
+               max_steps=None, timeout=None, memo_stats=False, profile=False, profile_collapsed=None, output=None):
+    """Runs one script, returns True if it ran to the end.
+
+    Program output and messages go to output (default stdout). Reports and
+    warnings go to stderr, or to output too when it is given. With profile
+    the script runs on the profiling tree-walker whatever the backend, and
+    profile_collapsed names a file for its collapsed stacks.
+    """
+    report = sys.stderr if output is None else output
+    interpreter = None
+    code = None
+    success = False
     try:
-        with open(filename, 'r') as f:
-            code = f.read()
-        
-        # 1. Lexer
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
-        
-        # 2. Parser
-        parser = Parser(tokens)
-        ast = parser.parse()
-        
-        # 3. Interpreter
-        interpreter = Interpreter()
-        interpreter.visit(ast)
+        backend_class = get_profiler(scoping) if profile else get_backend(backend, scoping)
+        interpreter = backend_class(output=output, max_steps=max_steps, timeout=timeout)
+        if stream:
+            # Lex the file chunk by chunk straight into the parser, so neither
+            # the whole source nor the whole token list is held in memory
+            ast = Parser(generate_tokens(read_chunks(filename))).parse()
+        else:
+            with open(filename, 'r') as f:
+                code = f.read()
+
+            if hasattr(interpreter, "run_source") and not optimize_ast:
+                interpreter.run_source(code)
+                ast = None
+            else:
+                # 1. Lexer + 2. Parser, skipped when the script's .kanpc is up to date
+                ast = kanpc.load(filename, code)
+
+        if ast is not None:
+            # 3. Optimizer
+            if optimize_ast:
+                ast, optimizer = optimize(ast, keep_declarations=(scoping == "lexical"))
+                print(optimizer.report(), file=report)
+
+            # 4. Interpreter
+            interpreter.run_prepared(interpreter.prepare(ast))
         
-        print("\n✅ Execution Complete: Sab chaukas chal raha hai")
+        print("\n✅ Execution Complete: Sab chaukas chal raha hai", file=output)
+        success = True
 
     except KanpError as e:
-        print(e)
+        print(e, file=output)
     except FileNotFoundError:
-        print(f"❌ Error: File '{filename}' nahi mili bhai.")
+        print(f"❌ Error: File '{filename}' nahi mili bhai.", file=output)
     except Exception as e:
-        print(f"❌ BaklolError: Interpreter hi fat gaya.\n{str(e)}")
+        print(f"❌ BaklolError: Interpreter hi fat gaya.\n{str(e)}", file=output)
+
+    if interpreter is not None:
+        # rangbaaj functions that could not be memoized, see memo.PurityChecker
+        for warning in interpreter.memos.warnings:
+            print(warning, file=report)
+        if memo_stats:
+            print(interpreter.memos.report(), file=report)
+        if profile:
+            print(interpreter.profile.report(code), file=report)
+            if profile_collapsed:
+                with open(profile_collapsed, "w") as f:
+                    f.write(interpreter.profile.collapsed())
+    return success
+
+# --- Batch mode ---
+# Lines of a failed script's output shown in batch mode without --verbose
+BATCH_TAIL_LINES = 8
+
+def find_scripts(paths):
+    """The given files, plus every .kanp file under the given directories."""
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                scripts.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".kanp"))
+        else:
+            scripts.append(path)
+    return scripts
+
+def run_captured(filename, options):
+    # Runs in a pool worker: one script, its output kept for the summary
+    output = io.StringIO()
+    start = time.perf_counter()
+    success = run_script(filename, output=output, **options)
+    return filename, success, output.getvalue(), time.perf_counter() - start
+
+def run_batch(filenames, jobs=None, verbose=False, **options):
+    """Runs many scripts in a process pool, prints each result as it finishes
+    and a summary. Returns the number of scripts that failed."""
+    scripts = find_scripts(filenames)
+    if not scripts:
+        print("❌ Error: Ek bhi .kanp file nahi mili bhai.")
+        return 1
+
+    start = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_captured, script, options): script for script in scripts}
+        for future in as_completed(futures):
+            try:
+                filename, success, output, seconds = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed for memory)
+                filename, success, seconds = futures[future], False, 0.0
+                output = f"❌ BaklolError: Interpreter hi fat gaya.\n{e!r}"
+            print(f"{'✅' if success else '❌'} {filename} ({seconds:.2f}s)")
+            if verbose or not success:
+                lines = output.strip().splitlines()
+                if not verbose:
+                    lines = lines[-BATCH_TAIL_LINES:]  # The error is at the end
+                print("\n".join("    " + line for line in lines))
+            if not success:
+                failed.append(filename)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(scripts)} scripts, {len(scripts) - len(failed)} chaukas, {len(failed)} kaand ({elapsed:.2f}s)")
+    for filename in sorted(failed):
+        print(f"  ❌ {filename}")
+    return len(failed)
+
+def compile_scripts(filenames):
+    """Writes a .kanpc for each script (kanp.py --compile), returns the number that failed."""
+    scripts = find_scripts(filenames)
+    if not scripts:
+        print("❌ Error: Ek bhi .kanp file nahi mili bhai.")
+        return 1
+    failed = 0
+    for script in scripts:
+        try:
+            print(f"✅ {script} -> {kanpc.compile_file(script)}")
+        except KanpError as e:
+            failed += 1
+            print(f"❌ {script}")
+            print("\n".join("    " + line for line in str(e).strip().splitlines()))
+        except FileNotFoundError:
+            failed += 1
+            print(f"❌ Error: File '{script}' nahi mili bhai.")
+        except (OSError, RecursionError) as e:
+            failed += 1
+            print(f"❌ {script}: .kanpc nahi likh paaye ({e})")
+    print(f"\n{len(scripts)} scripts, {len(scripts) - failed} compiled, {failed} kaand")
+    return failed
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="kanp.py", usage="python kanp.py [options] <filename.kanp> [more files or directories]")
+    arg_parser.add_argument("filenames", nargs="+", metavar="filename",
+                            help="script to run; several files or a directory run as a batch")
+    arg_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                            help="execution backend (default: %(default)s)")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="lex the file in chunks and parse tokens lazily (for very large scripts)")
+    arg_parser.add_argument("--scoping", choices=SCOPINGS, default=DEFAULT_SCOPING,
+                            help="'lexical' gives kaam calls their own array-backed frames (tree and closure backends)")
+    arg_parser.add_argument("-O", "--optimize", action="store_true",
+                            help="fold constants and prune dead branches before running")
+    arg_parser.add_argument("--max-steps", type=int, default=None,
+                            help="stop after this many loop iterations + function calls")
+    arg_parser.add_argument("--timeout", type=float, default=None,
+                            help="stop after this many seconds")
+    arg_parser.add_argument("--memo-stats", action="store_true",
+                            help="print rangbaaj memo hits and misses when done")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="run on the profiling tree-walker and print line hits, loop counts and function times")
+    arg_parser.add_argument("--profile-collapsed", metavar="FILE", default=None,
+                            help="with --profile, write collapsed stacks for flamegraph tools to FILE")
+    arg_parser.add_argument("--compile", action="store_true",
+                            help="only parse the scripts and write a .kanpc next to each, without running them")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="batch mode: scripts run at once (default: one per CPU)")
+    arg_parser.add_argument("-v", "--verbose", action="store_true",
+                            help="batch mode: print the output of every script, not only failed ones")
+    args = arg_parser.parse_args(argv)
+    options = dict(backend=args.backend, stream=args.stream, scoping=args.scoping, optimize_ast=args.optimize,
+                   max_steps=args.max_steps, timeout=args.timeout, memo_stats=args.memo_stats,
+                   profile=args.profile or bool(args.profile_collapsed))
+
+    if args.compile:
+        return 1 if compile_scripts(args.filenames) else 0
+
+    if len(args.filenames) == 1 and not os.path.isdir(args.filenames[0]):
+        run_script(args.filenames[0], profile_collapsed=args.profile_collapsed, **options)
+        return 0
+    if args.profile_collapsed:
+        arg_parser.error("--profile-collapsed works with one script, not a batch")
+    failures = run_batch(args.filenames, jobs=args.jobs, verbose=args.verbose, **options)
+    return 1 if failures else 0
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python kanp.py <filename.kanp>")
-    else:
-        run_script(sys.argv[1])
+    sys.exit(main())
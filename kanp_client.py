@@ -0,0 +1,108 @@
+"""Thin kanp.py front end that runs scripts in the warm daemon (daemon.py).
+
+Usage: python kanp_client.py [kanp.py options] <filename.kanp> [more files or directories]
+
+Takes the same arguments as kanp.py. When a daemon is listening on
+SOCKET_PATH, the arguments and the current directory are sent to it and
+its output and exit status are passed through, so the run skips module
+imports entirely. Otherwise kanp.main() runs in this process, exactly as
+'python kanp.py' would. Startup time is the point, so this imports only
+os, sys, socket and struct up front.
+"""
+import os
+import sys
+import socket
+import struct
+
+def default_socket_path():
+    # In a directory of its own that only this user may enter (daemon.py
+    # makes it 0700), so nobody else can put a socket at this path first
+    directory = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(directory, f"kanp-{os.getuid()}", "daemon.sock")
+
+SOCKET_PATH = os.environ.get("KANP_DAEMON_SOCKET") or default_socket_path()
+
+# --- Protocol ---
+# Every message is a frame: one kind byte, a 4-byte big-endian length, the payload.
+# The client sends RUN (cwd and arguments, NUL-separated) or STOP; the daemon
+# answers with STDOUT/STDERR text frames and ends with EXIT (the status as
+# digits) or RESTART (its code changed on disk, the client should run the
+# script itself).
+FRAME = struct.Struct("!cI")
+RUN, STOP = b"r", b"s"
+STDOUT, STDERR, EXIT, RESTART = b"o", b"e", b"x", b"R"
+
+def frame(kind, payload=b""):
+    return FRAME.pack(kind, len(payload)) + payload
+
+def read_frame(file):
+    """(kind, payload) of the next frame on file, (None, None) at EOF."""
+    header = file.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None, None
+    kind, size = FRAME.unpack(header)
+    payload = file.read(size)
+    if len(payload) < size:
+        return None, None
+    return kind, payload
+
+# struct ucred: pid, uid, gid
+PEER_CREDENTIALS = struct.Struct("3i")
+
+def peer_uid(sock):
+    """User id of the process at the other end of a Unix socket, None where the OS cannot tell."""
+    if not hasattr(socket, "SO_PEERCRED"):  # Linux only; elsewhere the 0700 directory has to do
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+    return PEER_CREDENTIALS.unpack(credentials)[1]
+
+def connect(path=SOCKET_PATH):
+    """Socket connected to the daemon at path, None when none of ours is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:  # No socket file, or a stale one nobody listens on
+        sock.close()
+        return None
+    uid = peer_uid(sock)
+    if uid is not None and uid != os.getuid():
+        # Someone else's process: it could answer with any output and exit status
+        sock.close()
+        print(f"⚠️ {path} pe kisi aur user ka daemon baitha hai, usse baat nahi karenge.", file=sys.stderr)
+        return None
+    return sock
+
+def run_remote(argv, path=SOCKET_PATH):
+    """Runs kanp.py argv in the daemon: its exit status, or None if there is no daemon to run it."""
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall(frame(RUN, b"\0".join(os.fsencode(arg) for arg in [os.getcwd(), *argv])))
+        while True:
+            kind, payload = read_frame(replies)
+            if kind == STDOUT:
+                sys.stdout.write(payload.decode("utf-8"))
+                sys.stdout.flush()
+            elif kind == STDERR:
+                sys.stderr.write(payload.decode("utf-8"))
+                sys.stderr.flush()
+            elif kind == EXIT:
+                return int(payload)
+            elif kind == RESTART:
+                return None
+            else:
+                break
+    print("❌ Error: Daemon beech mein hi band ho gaya.", file=sys.stderr)
+    return 1
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    status = run_remote(argv)
+    if status is None:
+        import kanp  # No daemon: pay for the imports here instead
+        status = kanp.main(argv)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
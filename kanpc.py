@@ -0,0 +1,120 @@
+import os
+import zlib
+import struct
+import marshal
+import hashlib
+from lexer import FastLexer
+from parser import Parser
+from compact_ast import PackedAST, NODE_TYPES, OP_TYPES, pack, unpack
+
+# Precompiled scripts: script.kanp's parsed program is saved as script.kanpc
+# next to it, like a .pyc, so the next run unpacks it instead of lexing and
+# parsing. KANP_KANPC=0 neither reads nor writes them during runs.
+ENABLED = os.environ.get("KANP_KANPC", "1") != "0"
+EXTENSION = ".kanpc"
+
+# Bump when the payload layout changes. The node and operator tables are
+# checked separately (LAYOUT), so adding a node type needs no bump.
+KANPC_VERSION = 1
+MAGIC = b"KANPC\0"
+LAYOUT = zlib.crc32(repr(([node_type.__name__ for node_type in NODE_TYPES], OP_TYPES)).encode("utf-8"))
+# magic, version, marshal version, layout, source size, source SHA-256, payload CRC-32
+HEADER = struct.Struct("<6sHHIQ32sI")
+
+def cache_path(source_path):
+    root, extension = os.path.splitext(source_path)
+    return (root if extension == ".kanp" else source_path) + EXTENSION
+
+def dumps(tree, source):
+    """.kanpc file contents for tree, parsed from source."""
+    packed = pack(tree)
+    columns = (packed.kinds, packed.a, packed.b, packed.c, packed.lines, packed.block_items, packed.block_ends)
+    payload = marshal.dumps((tuple(column.tobytes() for column in columns),
+                             tuple(packed.consts), tuple(packed.names), packed.root))
+    data = source.encode("utf-8")
+    header = HEADER.pack(MAGIC, KANPC_VERSION, marshal.version, LAYOUT, len(data),
+                         hashlib.sha256(data).digest(), zlib.crc32(payload))
+    return header + payload
+
+def loads(data, source):
+    """The tree saved in data if it was parsed from this source, else None.
+
+    Corrupt, truncated, stale or incompatible data all give None, never an error.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version, marshal_version, layout, size, digest, crc = HEADER.unpack_from(data)
+    if (magic, version, marshal_version, layout) != (MAGIC, KANPC_VERSION, marshal.version, LAYOUT):
+        return None
+    # Hash-based like a checked .pyc (PEP 552): the source is read anyway,
+    # and hashing it costs far less than parsing it
+    source = source.encode("utf-8")
+    if size != len(source) or digest != hashlib.sha256(source).digest():
+        return None
+    payload = memoryview(data)[HEADER.size:]
+    if zlib.crc32(payload) != crc:
+        return None
+    try:
+        columns, consts, names, root = marshal.loads(payload)
+        packed = PackedAST()
+        targets = (packed.kinds, packed.a, packed.b, packed.c, packed.lines, packed.block_items, packed.block_ends)
+        if len(columns) != len(targets):
+            return None
+        for column, raw in zip(targets, columns):
+            column.frombytes(raw)
+        packed.consts, packed.names, packed.root = list(consts), list(names), root
+        return unpack(packed)
+    except (ValueError, EOFError, TypeError, IndexError, KeyError):
+        return None
+
+def read(source_path, source):
+    """The tree from source_path's .kanpc, None if there is no usable one."""
+    try:
+        with open(cache_path(source_path), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return loads(data, source)
+
+def write(source_path, source, tree):
+    """Saves tree as source_path's .kanpc, returns its path. Raises OSError."""
+    path = cache_path(source_path)
+    data = dumps(tree, source)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Readers see the old file or the new one, never half of one
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+def parse(source):
+    return Parser(FastLexer(source).tokenize()).parse()
+
+def load(source_path, source):
+    """Parsed program of source, read from source_path's .kanpc when it is up to date.
+
+    Otherwise source is parsed and, if it parses, the .kanpc is (re)written.
+    Lexer and parser errors are raised as usual and leave no .kanpc behind.
+    """
+    if not ENABLED:
+        return parse(source)
+    tree = read(source_path, source)
+    if tree is None:
+        tree = parse(source)
+        try:
+            write(source_path, source, tree)
+        except (OSError, RecursionError):  # RecursionError: pack() of a very deep expression
+            pass  # Best effort, like transpiler's disk cache: a read-only directory just means no .kanpc
+    return tree
+
+def compile_file(source_path):
+    """Parses source_path and writes its .kanpc (kanp.py --compile), returns its path."""
+    with open(source_path, "r") as f:
+        source = f.read()
+    return write(source_path, source, parse(source))
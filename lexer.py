@@ -1,9 +1,23 @@
 import json
 import re
 import os
+import sys
 from errors import BaklolError
 
+def load_keywords():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    keywords_path = os.path.join(base_path, "keywords.json")
+    with open(keywords_path, "r") as f:
+        data = json.load(f)
+    return data["keywords"], data["boolean"]
+
+# Loaded once per process, not once per Lexer
+KEYWORDS, BOOLEANS = load_keywords()
+
 class Token:
+    # A big script has hundreds of thousands of tokens; no per-token __dict__
+    __slots__ = ("type", "value", "line")
+
     def __init__(self, type, value, line):
         self.type = type
         self.value = value
@@ -18,14 +32,8 @@ class Lexer:
         self.position = 0
         self.line = 1
         self.current_char = self.source_code[0] if self.source_code else None
-        
-        # Load keywords
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        keywords_path = os.path.join(base_path, "keywords.json")
-        with open(keywords_path, "r") as f:
-            data = json.load(f)
-            self.keywords = data["keywords"]
-            self.booleans = data["boolean"]
+        self.keywords = KEYWORDS
+        self.booleans = BOOLEANS
 
     def advance(self):
         self.position += 1
@@ -50,7 +58,7 @@ class Lexer:
             return Token(self.keywords[result], result, self.line)
         elif result in self.booleans:
             return Token("BOOLEAN", True if result == "sahi" else False, self.line)
-        return Token("IDENTIFIER", result, self.line)
+        return Token("IDENTIFIER", sys.intern(result), self.line)
 
     def make_number(self):
         result = ""
@@ -80,85 +88,234 @@ class Lexer:
         else:
             raise BaklolError("String band karna bhool gaye kya?", self.line)
 
-    def tokenize(self):
-        tokens = []
+    def next_token(self):
+        """Consumes one lexeme at the current position.
 
-        while self.current_char is not None:
-            if self.current_char.isspace():
-                self.skip_whitespace()
-                continue
-            
-            if self.current_char.isalpha() or self.current_char == '_':
-                tokens.append(self.make_identifier())
-                continue
-            
-            if self.current_char.isdigit():
-                tokens.append(self.make_number())
-                continue
-
-            if self.current_char == '"':
-                tokens.append(self.make_string())
-                continue
-
-            if self.current_char == '+':
-                tokens.append(Token("PLUS", "+", self.line))
-                self.advance()
-            elif self.current_char == '-':
-                tokens.append(Token("MINUS", "-", self.line))
-                self.advance()
-            elif self.current_char == '*':
-                tokens.append(Token("MUL", "*", self.line))
-                self.advance()
-            elif self.current_char == '/':
-                tokens.append(Token("DIV", "/", self.line))
-                self.advance()
-            elif self.current_char == '(':
-                tokens.append(Token("LPAREN", "(", self.line))
-                self.advance()
-            elif self.current_char == ')':
-                tokens.append(Token("RPAREN", ")", self.line))
-                self.advance()
-            elif self.current_char == '{':
-                tokens.append(Token("LBRACE", "{", self.line))
-                self.advance()
-            elif self.current_char == '}':
-                tokens.append(Token("RBRACE", "}", self.line))
-                self.advance()
-            elif self.current_char == ',':
-                tokens.append(Token("COMMA", ",", self.line))
-                self.advance()
-            elif self.current_char == '=':
+        Returns its Token, or None for whitespace and skipped characters.
+        """
+        if self.current_char.isspace():
+            self.skip_whitespace()
+            return None
+        
+        if self.current_char.isalpha() or self.current_char == '_':
+            return self.make_identifier()
+        
+        if self.current_char.isdigit():
+            return self.make_number()
+
+        if self.current_char == '"':
+            return self.make_string()
+
+        if self.current_char == '+':
+            token = Token("PLUS", "+", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '-':
+            token = Token("MINUS", "-", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '*':
+            token = Token("MUL", "*", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '/':
+            token = Token("DIV", "/", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '(':
+            token = Token("LPAREN", "(", self.line)
+            self.advance()
+            return token
+        elif self.current_char == ')':
+            token = Token("RPAREN", ")", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '{':
+            token = Token("LBRACE", "{", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '}':
+            token = Token("RBRACE", "}", self.line)
+            self.advance()
+            return token
+        elif self.current_char == ',':
+            token = Token("COMMA", ",", self.line)
+            self.advance()
+            return token
+        elif self.current_char == '=':
+            self.advance()
+            if self.current_char == '=':
+                token = Token("EQ", "==", self.line)
                 self.advance()
-                if self.current_char == '=':
-                    tokens.append(Token("EQ", "==", self.line))
-                    self.advance()
-                else:
-                    tokens.append(Token("ASSIGN", "=", self.line))
-            elif self.current_char == '>':
+                return token
+            else:
+                return Token("ASSIGN", "=", self.line)
+        elif self.current_char == '>':
+            self.advance()
+            if self.current_char == '=':
+                token = Token("GTE", ">=", self.line)
                 self.advance()
-                if self.current_char == '=':
-                    tokens.append(Token("GTE", ">=", self.line))
-                    self.advance()
-                else:
-                    tokens.append(Token("GT", ">", self.line))
-            elif self.current_char == '<':
+                return token
+            else:
+                return Token("GT", ">", self.line)
+        elif self.current_char == '<':
+            self.advance()
+            if self.current_char == '=':
+                token = Token("LTE", "<=", self.line)
                 self.advance()
-                if self.current_char == '=':
-                    tokens.append(Token("LTE", "<=", self.line))
-                    self.advance()
-                else:
-                    tokens.append(Token("LT", "<", self.line))
-            elif self.current_char == '!':
+                return token
+            else:
+                return Token("LT", "<", self.line)
+        elif self.current_char == '!':
+            self.advance()
+            if self.current_char == '=':
+                token = Token("NEQ", "!=", self.line)
                 self.advance()
-                if self.current_char == '=':
-                    tokens.append(Token("NEQ", "!=", self.line))
-                    self.advance()
-                else:
-                    raise BaklolError("Ye '!' kya hai be? '!=' likhna chah rahe ho kya?", self.line)
+                return token
             else:
-                self.advance() 
-                # Keeping it simple, skipping unknown chars or could throw error
-                # raise BaklolError(f"Ye '{self.current_char}' kya bawaseer hai?", self.line)
+                raise BaklolError("Ye '!' kya hai be? '!=' likhna chah rahe ho kya?", self.line)
+        else:
+            self.advance()
+            # Keeping it simple, skipping unknown chars or could throw error
+            # raise BaklolError(f"Ye '{self.current_char}' kya bawaseer hai?", self.line)
+            return None
+
+    def tokenize(self):
+        tokens = []
+
+        while self.current_char is not None:
+            token = self.next_token()
+            if token is not None:
+                tokens.append(token)
 
         tokens.append(Token("EOF", None, self.line))
         return tokens
+
+
+# One master pattern for FastLexer. The character classes are the ASCII
+# subsets of str.isspace/isalpha/isalnum/isdigit that Lexer uses, so both
+# lexers agree token for token. Anything touching a non-ASCII character
+# (outside string literals) is matched as UNICODE and handed to
+# Lexer.next_token, which has the full Unicode rules.
+TOKEN_PATTERN = re.compile(r"""[ \t\r\x0b\x0c\x1c-\x1f]*(?:
+    (?P<NEWLINE>\n[ \t\n\r\x0b\x0c\x1c-\x1f]*)
+  | (?P<UNICODE>[A-Za-z0-9_.]*+[^\x00-\x7f])
+  | (?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<NUMBER>[0-9]+(?P<FRACTION>\.[0-9]*)?)
+  | (?P<STRING>"[^"]*")
+  | (?P<OPERATOR>==|>=|<=|!=|[-+*/(){},=<>])
+  | (?P<BAD>[!"])
+  | (?P<SKIP>.)
+  | \Z)""", re.VERBOSE | re.DOTALL)
+
+OPERATORS = {
+    "+": "PLUS", "-": "MINUS", "*": "MUL", "/": "DIV",
+    "(": "LPAREN", ")": "RPAREN", "{": "LBRACE", "}": "RBRACE", ",": "COMMA",
+    "=": "ASSIGN", "==": "EQ", ">": "GT", ">=": "GTE", "<": "LT", "<=": "LTE", "!=": "NEQ",
+}
+
+def generate_tokens(chunks):
+    """Lazily tokenizes source text arriving as an iterable of string chunks.
+
+    Yields the same Token stream as Lexer.tokenize, ending with EOF. Only the
+    unconsumed tail of the current chunk is buffered, so a file can be lexed
+    without ever holding all of it (or all of its tokens) in memory.
+    """
+    keywords = KEYWORDS
+    booleans = BOOLEANS
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    line = 1
+    at_eof = False
+
+    while True:
+        end = len(buffer)
+        need_more = True
+        for match in TOKEN_PATTERN.finditer(buffer, pos):
+            kind = match.lastgroup
+            if not at_eof and (match.end() == end or kind == "BAD"):
+                # Token may continue in the next chunk ('"' may still be closed there)
+                pos = match.start()
+                break
+
+            if kind == "IDENTIFIER":
+                text = match.group(kind)
+                if text in keywords:
+                    yield Token(keywords[text], text, line)
+                elif text in booleans:
+                    yield Token("BOOLEAN", text == "sahi", line)
+                else:
+                    # Interned, so every use of a name shares one string
+                    yield Token("IDENTIFIER", sys.intern(text), line)
+            elif kind == "OPERATOR":
+                text = match.group(kind)
+                yield Token(OPERATORS[text], text, line)
+            elif kind == "NEWLINE":
+                line += match.group(kind).count("\n")
+            elif kind == "NUMBER":
+                if match.group("FRACTION") is None:
+                    yield Token("INTEGER", int(match.group(kind)), line)
+                else:
+                    yield Token("FLOAT", float(match.group(kind)), line)
+            elif kind == "STRING":
+                yield Token("STRING", match.group(kind)[1:-1], line)
+            elif kind == "BAD":
+                if match.group(kind) == '"':
+                    raise BaklolError("String band karna bhool gaye kya?", line)
+                raise BaklolError("Ye '!' kya hai be? '!=' likhna chah rahe ho kya?", line)
+            elif kind == "UNICODE":
+                # One lexeme the slow way, then resume the fast scan after it
+                lexer = Lexer(buffer)
+                lexer.position = match.start(kind)
+                lexer.current_char = buffer[lexer.position]
+                lexer.line = line
+                try:
+                    token = lexer.next_token()
+                except Exception:
+                    if at_eof or lexer.position < end:
+                        raise
+                    token = None
+                if not at_eof and lexer.position >= end:
+                    pos = match.start(kind)
+                    break
+                if token is not None:
+                    yield token
+                pos, line = lexer.position, lexer.line
+                need_more = False
+                break
+            elif kind is None:
+                # End of input
+                pos = end
+            # SKIP: unknown ASCII characters are ignored, same as Lexer
+
+        if not need_more:
+            continue
+        if at_eof:
+            yield Token("EOF", None, line)
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            at_eof = True
+        else:
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+def read_chunks(filename, chunk_size=1 << 20):
+    """Reads a source file as text chunks for generate_tokens."""
+    with open(filename, "r") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+class FastLexer(Lexer):
+    """Single-pass Lexer: one compiled regex, substrings sliced out of the source.
+
+    Emits exactly the same Token stream as Lexer.tokenize, including line
+    numbers (newlines inside strings are not counted, same as Lexer).
+    """
+
+    def tokenize(self):
+        return list(generate_tokens((self.source_code,)))
@@ -0,0 +1,220 @@
+import os
+from collections import OrderedDict
+from parser import *
+from errors import GyaanPelWarning
+
+# Results kept per rangbaaj function, least recently used dropped first
+MEMO_SIZE = int(os.environ.get("KANP_MEMO_SIZE", 4096))
+
+# Memo.get() result for a key that is not cached (None is a valid result)
+MISS = object()
+
+class Memo:
+    """Bounded LRU of one rangbaaj function's results, keyed by its arguments."""
+
+    def __init__(self, name, maxsize=MEMO_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(args):
+        # Typed like functools.lru_cache(typed=True): 1, 1.0 and sahi print differently
+        return (*args, *map(type, args))
+
+    def get(self, key):
+        try:
+            value = self.results[key]
+        except KeyError:
+            self.misses += 1
+            return MISS
+        self.results.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.results[key] = value
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    def __repr__(self):
+        return f"Memo({self.name}, {self.hits} hits, {self.misses} misses, {len(self.results)} cached)"
+
+class MemoTable:
+    """Memo state of one interpreter: a Memo per declared rangbaaj, plus purity warnings.
+
+    Backends call declare() whenever a function declaration runs, so a
+    redeclared function starts with an empty memo (and a kaam declared
+    over a rangbaaj drops it), then look the Memo up by name on calls.
+    """
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self.memos = {}
+        self.retired = []   # Memos of redeclared functions, still counted in stats()
+        self.warnings = []
+        self._warned = set()
+
+    def declare(self, name, is_expert, memoize, impurity, line):
+        old = self.memos.pop(name, None)
+        if old is not None:
+            self.retired.append(old)
+        if memoize:
+            self.memos[name] = Memo(name, self.maxsize)
+        elif is_expert and impurity is not None and (name, line) not in self._warned:
+            self._warned.add((name, line))
+            self.warnings.append(GyaanPelWarning(f"rangbaaj '{name}' ka result yaad nahi rakhenge: {impurity}.", line))
+
+    def get(self, name):
+        return self.memos.get(name)
+
+    def stats(self):
+        """(name, hits, misses, cached) per function, redeclarations summed up."""
+        totals = {}
+        for memo in self.retired + list(self.memos.values()):
+            hits, misses, cached = totals.get(memo.name, (0, 0, 0))
+            totals[memo.name] = (hits + memo.hits, misses + memo.misses, cached + len(memo.results))
+        return [(name, *counts) for name, counts in totals.items()]
+
+    def report(self):
+        lines = ["Rangbaaj memo:"]
+        for name, hits, misses, cached in self.stats():
+            calls = hits + misses
+            rate = hits / calls * 100 if calls else 0.0
+            lines.append(f"  {name}: {hits} hits, {misses} misses ({rate:.1f}% hit), {cached} cached")
+        return "\n".join(lines)
+
+class PurityChecker:
+    """Decides which rangbaaj functions may be memoized.
+
+    A body is pure when its result depends only on its arguments and
+    running it changes nothing outside the call: it must not bol, baklol,
+    declare functions, read or write variables other than its own, or call
+    a function that is not pure itself. Under dynamic scoping only params
+    are a function's own (a hum_rakhte_hain in a body writes global_env and
+    outlives the call); under lexical scoping everything the Resolver put
+    at depth 0 is. Calls are resolved by name over the whole program, so a
+    call is pure only if every declaration of that name is; recursion is
+    fine.
+
+    Sets memoize and impurity (the reason it is not pure, or None) on every
+    FunctionDecl. Lexical checks need the Resolver's annotations.
+    """
+
+    def __init__(self, lexical=False):
+        self.lexical = lexical
+        self.declarations = {}
+        self.calls = {}   # FunctionDecl -> names it calls
+
+    def check(self, tree):
+        self.collect(tree)
+        decls = [decl for same_name in self.declarations.values() for decl in same_name]
+        for decl in decls:
+            self.calls[decl] = set()
+            decl.impurity = self.visit(decl.body, decl)
+        # A call to anything impure makes the caller impure, until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for decl in decls:
+                if decl.impurity is not None:
+                    continue
+                for name in self.calls[decl]:
+                    if any(callee.impurity is not None for callee in self.declarations.get(name, ())):
+                        decl.impurity = f"'{name}' bulata hai, jo pure nahi hai"
+                        changed = True
+                        break
+        for decl in decls:
+            decl.memoize = decl.is_expert and decl.impurity is None
+        return tree
+
+    def collect(self, node):
+        if isinstance(node, list):
+            for stmt in node:
+                self.collect(stmt)
+        elif isinstance(node, FunctionDecl):
+            self.declarations.setdefault(node.name, []).append(node)
+            self.collect(node.body)
+        elif isinstance(node, IfBlock):
+            self.collect(node.body)
+            if node.else_body:
+                self.collect(node.else_body)
+        elif isinstance(node, (WhileBlock, BhaukaalBlock)):
+            self.collect(node.body)
+
+    def visit(self, node, decl):
+        """Reason the first impure node in node is impure, or None."""
+        if isinstance(node, list):
+            for stmt in node:
+                reason = self.visit(stmt, decl)
+                if reason is not None:
+                    return reason
+            return None
+        method_name = 'check_' + type(node).__name__
+        checker = getattr(self, method_name, self.generic_check)
+        return checker(node, decl)
+
+    def generic_check(self, node, decl):
+        # Literals, NoOp
+        return None
+
+    def is_own(self, node, name, decl):
+        if self.lexical:
+            return node.depth == 0
+        return name in decl.params
+
+    def check_BinOp(self, node, decl):
+        return self.visit(node.left, decl) or self.visit(node.right, decl)
+
+    def check_Negate(self, node, decl):
+        return self.visit(node.expression, decl)
+
+    def check_VarAccess(self, node, decl):
+        if not self.is_own(node, node.var_name, decl):
+            return f"bahar ka variable '{node.var_name}' padhta hai"
+        return None
+
+    def check_VarAssign(self, node, decl):
+        if not self.is_own(node, node.left.var_name, decl):
+            return f"bahar ka variable '{node.left.var_name}' badalta hai"
+        return self.visit(node.right, decl)
+
+    def check_VarDecl(self, node, decl):
+        if not self.is_own(node, node.var_name, decl):
+            return f"global variable '{node.var_name}' banata hai"
+        return self.visit(node.expression, decl)
+
+    def check_Print(self, node, decl):
+        return "bol se print karta hai"
+
+    def check_Throw(self, node, decl):
+        return "baklol phenkta hai"
+
+    def check_FunctionDecl(self, node, decl):
+        return f"andar function '{node.name}' banata hai"
+
+    def check_IfBlock(self, node, decl):
+        return self.visit(node.condition, decl) or self.visit(node.body, decl) or self.visit(node.else_body or [], decl)
+
+    def check_WhileBlock(self, node, decl):
+        return self.visit(node.condition, decl) or self.visit(node.body, decl)
+
+    def check_BhaukaalBlock(self, node, decl):
+        return self.visit(node.body, decl)
+
+    def check_Return(self, node, decl):
+        return self.visit(node.expression, decl)
+
+    def check_FunctionCall(self, node, decl):
+        self.calls[decl].add(node.name)
+        for arg in node.args:
+            reason = self.visit(arg, decl)
+            if reason is not None:
+                return reason
+        return None
+
+def check_purity(tree, lexical=False):
+    """Annotates every FunctionDecl in tree with memoize/impurity, returns tree."""
+    return PurityChecker(lexical).check(tree)
@@ -0,0 +1,161 @@
+import threading
+from time import perf_counter
+from bisect import bisect_left
+
+# Seconds, from a cached hello-world run to a program stopped by the timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_value(value):
+    # The text format spells these NaN, +Inf and -Inf; repr() gives nan, inf and -inf
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+class Metric:
+    """A metric whose values are kept per thread and added up when scraped.
+
+    Every thread updates its own shard (a dict of label values -> value),
+    so recording never takes a lock or contends with the other request
+    threads; the lock is only taken the first time a thread records, and
+    when scraping. Label values are passed positionally, in labels order.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def snapshot(self):
+        # dict() copies in one step, so a thread recording meanwhile cannot break the iteration
+        with self.lock:
+            return [dict(shard) for shard in self.shards]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines) + "\n"
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        shard = self.shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for shard in self.snapshot():
+            for label_values, value in shard.items():
+                totals[label_values] = totals.get(label_values, 0) + value
+        return totals
+
+    def samples(self):
+        for label_values, value in sorted(self.collect().items()):
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+class Gauge(Counter):
+    """A Counter that may go down: in-flight requests, added to and taken from by the same thread."""
+
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        shard = self.shard()
+        counts = shard.get(label_values)
+        if counts is None:
+            # One count per bucket, one for +Inf, then the sum
+            counts = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *label_values):
+        """Context manager that observes the seconds its block took, also when it raises."""
+        return Timer(self.observe, label_values)
+
+    def collect(self):
+        totals = {}
+        for shard in self.snapshot():
+            for label_values, counts in shard.items():
+                counts = list(counts)
+                total = totals.get(label_values)
+                if total is None:
+                    totals[label_values] = counts
+                else:
+                    for i, count in enumerate(counts):
+                        total[i] += count
+        return totals
+
+    def samples(self):
+        for label_values, counts in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = format_labels(self.labels, label_values, f'le="{format_value(float(bound))}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_value(counts[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class Timer:
+    """Calls observe(seconds, *label_values) when its with-block ends, also when it raises."""
+
+    __slots__ = ("observe", "label_values", "start")
+
+    def __init__(self, observe, label_values):
+        self.observe = observe
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.observe(perf_counter() - self.start, *self.label_values)
+        return False
+
+def render(name, kind, help, labels, samples):
+    """Text for a metric read at scrape time (e.g. from a cache's stats()): samples is [(label values, value), ...]."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{format_labels(labels, label_values)} {format_value(value)}"
+                 for label_values, value in samples)
+    return "\n".join(lines) + "\n"
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
@@ -0,0 +1,171 @@
+from parser import *
+from lexer import Token
+from closure_compiler import BINARY_OPS
+from rope import flatten
+from resolver import Resolver, Scope
+
+# Folding "a" * 1000000 at compile time would just move the cost (and memory)
+# from running to compiling, so bigger string results stay as runtime BinOps
+MAX_FOLDED_STRING = 4096
+
+def count_nodes(node):
+    if isinstance(node, list):
+        return sum(count_nodes(child) for child in node)
+    if not isinstance(node, AST):
+        return 0
+    total = 1
+    for _, value in node.fields():
+        if isinstance(value, (AST, list)):
+            total += count_nodes(value)
+    return total
+
+def literal(value, line):
+    if isinstance(value, bool):
+        return Boolean(Token("BOOLEAN", value, line))
+    if isinstance(value, int):
+        return Num(Token("INTEGER", value, line))
+    if isinstance(value, float):
+        return Num(Token("FLOAT", value, line))
+    return String(Token("STRING", value, line))
+
+def is_literal(node):
+    return isinstance(node, (Num, String, Boolean))
+
+def declares_variables(nodes):
+    scope = Scope()
+    Resolver().declare_all(nodes, scope)
+    return bool(scope.slots)
+
+class Optimizer:
+    """AST pass run between Parser.parse() and execution.
+
+    - folds BinOps whose operands are literals (unless evaluating them would
+      raise, so the error still happens at runtime)
+    - prunes agar/warna branches and jabtak loops decided by a literal condition
+    - drops NoOps and empty bhaukaal blocks, flattens nested statement lists
+    - lowers the parser's unary minus, BinOp(Num(0), MINUS, x), to Negate(x)
+
+    With keep_declarations (lexical scoping), branches that declare variables
+    are never pruned, because the declaration decides which scope a name
+    resolves to even if it never runs.
+    """
+
+    def __init__(self, keep_declarations=False):
+        self.keep_declarations = keep_declarations
+        self.nodes_before = 0
+        self.nodes_after = 0
+
+    def optimize(self, tree):
+        self.nodes_before = count_nodes(tree)
+        tree = self.block(tree)
+        self.nodes_after = count_nodes(tree)
+        return tree
+
+    def report(self):
+        removed = self.nodes_before - self.nodes_after
+        return f"⚡ Optimizer: {removed} nodes hata diye ({self.nodes_before} -> {self.nodes_after})"
+
+    def block(self, nodes):
+        statements = []
+        for node in nodes:
+            result = self.statement(node)
+            if isinstance(result, list):
+                statements.extend(result)
+            elif result is not None:
+                statements.append(result)
+        return statements
+
+    def can_drop(self, nodes):
+        return not (self.keep_declarations and declares_variables(nodes))
+
+    # --- Statements: return a node, a list to splice in, or None to drop ---
+    def statement(self, node):
+        if isinstance(node, list):
+            return self.block(node)
+        method_name = 'statement_' + type(node).__name__
+        method = getattr(self, method_name, None)
+        return method(node) if method else node
+
+    def statement_NoOp(self, node):
+        return None
+
+    def statement_VarDecl(self, node):
+        node.expression = self.expr(node.expression)
+        return node
+
+    def statement_VarAssign(self, node):
+        node.right = self.expr(node.right)
+        return node
+
+    def statement_Print(self, node):
+        node.expression = self.expr(node.expression)
+        return node
+
+    def statement_Return(self, node):
+        node.expression = self.expr(node.expression)
+        return node
+
+    def statement_FunctionCall(self, node):
+        return self.expr(node)
+
+    def statement_IfBlock(self, node):
+        node.condition = self.expr(node.condition)
+        node.body = self.block(node.body)
+        node.else_body = self.block(node.else_body) if node.else_body else None
+        if is_literal(node.condition):
+            if node.condition.value:
+                taken, dropped = node.body, node.else_body or []
+            else:
+                taken, dropped = node.else_body or [], node.body
+            if self.can_drop(dropped):
+                return taken
+        return node
+
+    def statement_WhileBlock(self, node):
+        node.condition = self.expr(node.condition)
+        node.body = self.block(node.body)
+        if is_literal(node.condition) and not node.condition.value and self.can_drop(node.body):
+            return None
+        return node
+
+    def statement_BhaukaalBlock(self, node):
+        node.body = self.block(node.body)
+        return node if node.body else None
+
+    def statement_FunctionDecl(self, node):
+        node.body = self.block(node.body)
+        return node
+
+    # --- Expressions ---
+    def expr(self, node):
+        if isinstance(node, BinOp):
+            return self.expr_BinOp(node)
+        if isinstance(node, FunctionCall):
+            node.args = [self.expr(arg) for arg in node.args]
+        elif isinstance(node, Negate):
+            node.expression = self.expr(node.expression)
+        return node
+
+    def expr_BinOp(self, node):
+        node.left = self.expr(node.left)
+        node.right = self.expr(node.right)
+
+        if is_literal(node.left) and is_literal(node.right):
+            try:
+                value = flatten(BINARY_OPS[node.op.type](node.left.value, node.right.value))
+            except Exception:
+                # e.g. 1 / 0 or "a" - 1: leave it to fail at runtime, as before
+                return node
+            if not (isinstance(value, str) and len(value) > MAX_FOLDED_STRING):
+                return literal(value, node.op.line)
+
+        # Only an int 0 on the left: 0.0 - x and False - x give different results
+        left = node.left
+        if (node.op.type == 'MINUS' and isinstance(left, Num)
+                and type(left.value) is int and left.value == 0):
+            return Negate(node.right, node.op.line)
+        return node
+
+def optimize(tree, keep_declarations=False):
+    optimizer = Optimizer(keep_declarations)
+    return optimizer.optimize(tree), optimizer
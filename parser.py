@@ -1,122 +1,173 @@
 from errors import BaklolError
+from lexer import Token
 
 # --- AST Nodes ---
+# Every node is slotted: a cached program is mostly AST, and a per-node
+# __dict__ costs more than the node's own fields. Slots that passes fill in
+# later (resolver.Resolver's depth/slot, ...) are declared here too.
 class AST:
-    pass
+    __slots__ = ()
+
+    def fields(self):
+        # (name, value) of every attribute that is set, for generic tree walks
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(self, name):
+                    yield name, getattr(self, name)
 
 class BinOp(AST):
+    __slots__ = ("left", "op", "right", "line")
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        self.line = op.line
     def __repr__(self):
         return f"({self.left} {self.op.value} {self.right})"
 
 class Num(AST):
+    __slots__ = ("value", "line")
     def __init__(self, token):
-        self.token = token
         self.value = token.value
+        self.line = token.line
     def __repr__(self):
         return str(self.value)
 
 class String(AST):
+    __slots__ = ("value", "line")
     def __init__(self, token):
-        self.token = token
         self.value = token.value
+        self.line = token.line
     def __repr__(self):
         return f'"{self.value}"'
 
 class Boolean(AST):
+    __slots__ = ("value", "line")
     def __init__(self, token):
-        self.token = token
         self.value = token.value
+        self.line = token.line
     def __repr__(self):
         return str(self.value)
 
 class VarAccess(AST):
+    __slots__ = ("var_name", "line", "depth", "slot")
     def __init__(self, token):
         self.var_name = token.value
+        self.line = token.line
     def __repr__(self):
         return f"Var({self.var_name})"
 
 class VarAssign(AST):
+    __slots__ = ("left", "right", "line", "depth", "slot")
     def __init__(self, left, right):
         self.left = left # VarAccess
         self.right = right # Expression
+        self.line = left.line
     def __repr__(self):
         return f"Assign({self.left.var_name} = {self.right})"
 
 class VarDecl(AST):
-    def __init__(self, var_name, expression):
+    __slots__ = ("var_name", "expression", "line", "depth", "slot")
+    def __init__(self, var_name, expression, line=0):
         self.var_name = var_name
         self.expression = expression
+        self.line = line
     def __repr__(self):
         return f"Decl({self.var_name} = {self.expression})"
 
 class Print(AST):
-    def __init__(self, expression):
+    __slots__ = ("expression", "line")
+    def __init__(self, expression, line=0):
         self.expression = expression
+        self.line = line
     def __repr__(self):
         return f"Print({self.expression})"
 
 class IfBlock(AST):
-    def __init__(self, condition, body, else_body=None):
+    __slots__ = ("condition", "body", "else_body", "line")
+    def __init__(self, condition, body, else_body=None, line=0):
         self.condition = condition
         self.body = body
         self.else_body = else_body
+        self.line = line
     def __repr__(self):
         return f"If({self.condition}) {{ ... }}"
 
 class WhileBlock(AST):
-    def __init__(self, condition, body):
+    __slots__ = ("condition", "body", "line")
+    def __init__(self, condition, body, line=0):
         self.condition = condition
         self.body = body
+        self.line = line
     def __repr__(self):
         return f"While({self.condition}) {{ ... }}"
 
 class BhaukaalBlock(AST):
-    def __init__(self, body):
+    __slots__ = ("body", "line")
+    def __init__(self, body, line=0):
         self.body = body
+        self.line = line
     def __repr__(self):
         return "BhaukaalBlock"
 
 class NoOp(AST):
-    pass
+    __slots__ = ()
+
+class Negate(AST):
+    # Unary minus, only produced by optimizer.py. Evaluates as 0 - expression,
+    # exactly like the BinOp the parser builds for it.
+    __slots__ = ("expression", "line")
+    def __init__(self, expression, line=0):
+        self.expression = expression
+        self.line = line
+    def __repr__(self):
+        return f"-({self.expression})"
 
 class FunctionDecl(AST):
-    def __init__(self, name, params, body, is_expert=False):
+    __slots__ = ("name", "params", "body", "is_expert", "line", "memoize", "impurity",
+                 "param_slots", "frame_size", "empty_frame")
+    def __init__(self, name, params, body, is_expert=False, line=0):
         self.name = name
         self.params = params
         self.body = body
         self.is_expert = is_expert
+        self.line = line
+        # Set by memo.check_purity; unchecked functions are never memoized
+        self.memoize = False
+        self.impurity = None
     def __repr__(self):
         return f"Func({self.name}, {self.params})"
 
 class FunctionCall(AST):
-    def __init__(self, name, args):
+    __slots__ = ("name", "args", "line")
+    def __init__(self, name, args, line=0):
         self.name = name
         self.args = args
+        self.line = line
     def __repr__(self):
         return f"Call({self.name}, {self.args})"
 
 class Return(AST):
-    def __init__(self, expression):
+    __slots__ = ("expression", "line")
+    def __init__(self, expression, line=0):
         self.expression = expression
+        self.line = line
     def __repr__(self):
         return f"Return({self.expression})"
 
 # --- Parser ---
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.token_idx = 0
-        self.current_token = self.tokens[self.token_idx]
+        # Any iterable of tokens works: a list from Lexer.tokenize or the
+        # lazy lexer.generate_tokens stream. The grammar only ever looks at
+        # current_token, so that is the whole lookahead buffer.
+        self.tokens = iter(tokens)
+        self.current_token = next(self.tokens)
 
     def eat(self, token_type):
         if self.current_token.type == token_type:
-            self.token_idx += 1
-            if self.token_idx < len(self.tokens):
-                self.current_token = self.tokens[self.token_idx]
+            # Stay on EOF once the stream is exhausted
+            self.current_token = next(self.tokens, self.current_token)
         else:
             raise BaklolError(f"Umeed thi '{token_type}' ki, par mila '{self.current_token.type}'", self.current_token.line)
 
@@ -127,7 +178,7 @@ class Parser:
             return self.factor()
         elif token.type == 'MINUS':
             self.eat('MINUS')
-            return BinOp(Num(0), token, self.factor()) # Unary minus
+            return BinOp(Num(Token('INTEGER', 0, token.line)), token, self.factor()) # Unary minus
         elif token.type in ('INTEGER', 'FLOAT'):
             self.eat(token.type)
             return Num(token)
@@ -149,7 +200,7 @@ class Parser:
                         self.eat('COMMA')
                         args.append(self.expr())
                 self.eat('RPAREN')
-                return FunctionCall(token.value, args)
+                return FunctionCall(token.value, args, token.line)
             return VarAccess(token)
         elif token.type == 'LPAREN':
             self.eat('LPAREN')
@@ -180,12 +231,13 @@ class Parser:
 
     def statement(self):
         if self.current_token.type == 'VAR_DECL':
+            line = self.current_token.line
             self.eat('VAR_DECL')
             var_name = self.current_token.value
             self.eat('IDENTIFIER')
             self.eat('ASSIGN')
             expr = self.expr()
-            return VarDecl(var_name, expr)
+            return VarDecl(var_name, expr, line)
         elif self.current_token.type == 'IDENTIFIER':
             # Assignment: x = 5 (OR Function Call as a statement?)
             # If function call, we parse it as expr, but need to handle result discard if just statement.
@@ -229,15 +281,17 @@ class Parser:
                         self.eat('COMMA')
                         args.append(self.expr())
                 self.eat('RPAREN')
-                return FunctionCall(var_token.value, args)
+                return FunctionCall(var_token.value, args, var_token.line)
             else:
                  raise BaklolError(f"Na to assignment hai na function call, kya chahte ho '{var_token.value}' se?", var_token.line)
 
         elif self.current_token.type == 'PRINT':
+            line = self.current_token.line
             self.eat('PRINT')
             expr = self.expr()
-            return Print(expr)
+            return Print(expr, line)
         elif self.current_token.type == 'IF':
+            line = self.current_token.line
             self.eat('IF')
             condition = self.expr()
             self.eat('LBRACE')
@@ -249,31 +303,35 @@ class Parser:
                 self.eat('LBRACE')
                 else_body = self.block()
                 self.eat('RBRACE')
-            return IfBlock(condition, body, else_body)
+            return IfBlock(condition, body, else_body, line)
         elif self.current_token.type == 'WHILE':
+            line = self.current_token.line
             self.eat('WHILE')
             condition = self.expr()
             self.eat('LBRACE')
             body = self.block()
             self.eat('RBRACE')
-            return WhileBlock(condition, body)
+            return WhileBlock(condition, body, line)
         elif self.current_token.type == 'ADVANCED_BLOCK':
+            line = self.current_token.line
             self.eat('ADVANCED_BLOCK')
             self.eat('LBRACE')
             body = self.block()
             self.eat('RBRACE')
-            return BhaukaalBlock(body)
+            return BhaukaalBlock(body, line)
         elif self.current_token.type == 'THROW_ERROR':
             self.eat('THROW_ERROR')
             msg_token = self.current_token
             self.eat('STRING')
             return Throw(msg_token)
         elif self.current_token.type == 'RETURN':
+            line = self.current_token.line
             self.eat('RETURN')
             expr = self.expr()
-            return Return(expr)
+            return Return(expr, line)
         elif self.current_token.type == 'FUNCTION':
             self.eat('FUNCTION')
+            line = self.current_token.line
             func_name = self.current_token.value
             self.eat('IDENTIFIER')
             self.eat('LPAREN')
@@ -289,13 +347,14 @@ class Parser:
             self.eat('LBRACE')
             body = self.block()
             self.eat('RBRACE')
-            return FunctionDecl(func_name, params, body, is_expert=False)
+            return FunctionDecl(func_name, params, body, is_expert=False, line=line)
         elif self.current_token.type == 'EXPERT_FUNC':
             self.eat('EXPERT_FUNC')
             # Check if optional 'kaam' is present
             if self.current_token.type == 'FUNCTION':
                 self.eat('FUNCTION')
             
+            line = self.current_token.line
             func_name = self.current_token.value
             self.eat('IDENTIFIER')
             self.eat('LPAREN')
@@ -311,7 +370,7 @@ class Parser:
             self.eat('LBRACE')
             body = self.block()
             self.eat('RBRACE')
-            return FunctionDecl(func_name, params, body, is_expert=True)
+            return FunctionDecl(func_name, params, body, is_expert=True, line=line)
         
         elif self.current_token.type == 'LBRACE':
              # Nested block
@@ -320,8 +379,9 @@ class Parser:
             self.eat('RBRACE')
             return stmts
         else:
-             # Empty statement or error
-             return NoOp()
+            # Nothing was consumed, so returning here would make block() loop forever
+            token = self.current_token
+            raise BaklolError(f"'{token.value}' se koi statement shuru nahi hota, ye yahan kya kar raha hai?", token.line)
 
     def block(self):
         valid_stops = ('RBRACE', 'EOF')
@@ -336,6 +396,7 @@ class Parser:
         return self.block()
 
 class Throw(AST):
+    __slots__ = ("message", "line")
     def __init__(self, message_token):
         self.message = message_token.value
         self.line = message_token.line
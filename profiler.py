@@ -0,0 +1,174 @@
+import time
+from collections import Counter
+from interpreter import Interpreter
+from resolver import LexicalInterpreter
+from backends import DEFAULT_SCOPING, get_backend
+
+# Name of the top-level program in stacks and reports
+MAIN = "<main>"
+
+class FunctionStats:
+    __slots__ = ("name", "line", "calls", "inclusive", "exclusive")
+
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+
+class Profile:
+    """What one profiled run did: line hits, loop iterations, function times.
+
+    Times are wall-clock seconds from time.perf_counter(). A function's
+    inclusive time counts its outermost activation only, so recursion is
+    not counted twice; exclusive time leaves out the functions it called.
+    A call answered from a rangbaaj memo never runs the body and is not
+    counted as a call (see memo_hits).
+    """
+
+    def __init__(self):
+        self.line_hits = Counter()  # line -> statements run on it
+        self.loops = Counter()      # line of a jabtak -> iterations
+        self.functions = {}         # name -> FunctionStats
+        self.stacks = Counter()     # (MAIN, f, g, ...) -> exclusive seconds
+        self.memo_hits = {}         # rangbaaj name -> memo hits
+        self.total = 0.0
+        self.active = Counter()     # name -> activations on the stack
+        # Running activations: [name, start, seconds spent in callees]
+        self.frames = [[MAIN, 0.0, 0.0]]
+
+    def start(self):
+        self.frames = [[MAIN, time.perf_counter(), 0.0]]
+
+    def stop(self):
+        # Unwinds what an error left open, then closes <main>
+        while len(self.frames) > 1:
+            self.exit()
+        _, start, children = self.frames[0]
+        self.total = time.perf_counter() - start
+        self.stacks[(MAIN,)] += self.total - children
+
+    def enter(self, decl):
+        stats = self.functions.get(decl.name)
+        if stats is None:
+            stats = self.functions[decl.name] = FunctionStats(decl.name, decl.line)
+        stats.calls += 1
+        self.active[decl.name] += 1
+        self.frames.append([decl.name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stack = tuple(frame[0] for frame in self.frames)
+        name, start, children = self.frames.pop()
+        elapsed = time.perf_counter() - start
+        stats = self.functions[name]
+        stats.exclusive += elapsed - children
+        self.active[name] -= 1
+        if not self.active[name]:
+            stats.inclusive += elapsed
+        self.frames[-1][2] += elapsed
+        self.stacks[stack] += elapsed - children
+
+    def report(self, source=None, limit=20):
+        """Sorted text report; with the program's source, hot lines are shown too."""
+        lines = [f"Profile: {self.total:.4f}s total"]
+        if self.functions:
+            lines.append("")
+            lines.append(f"  {'function':<20} {'line':>5} {'calls':>9} {'memo hits':>9} {'inclusive':>10} {'exclusive':>10}")
+            for stats in sorted(self.functions.values(), key=lambda stats: stats.exclusive, reverse=True):
+                lines.append(f"  {stats.name:<20} {stats.line:>5} {stats.calls:>9} {self.memo_hits.get(stats.name, 0):>9} "
+                             f"{stats.inclusive:>9.4f}s {stats.exclusive:>9.4f}s")
+        if self.loops:
+            lines.append("")
+            lines.append(f"  {'jabtak line':<11} {'iterations':>10}")
+            for line, count in sorted(self.loops.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"  {line:<11} {count:>10}")
+        if self.line_hits:
+            source_lines = source.splitlines() if source is not None else []
+            lines.append("")
+            lines.append(f"  {'line':>5} {'hits':>10}  source")
+            for line, count in self.line_hits.most_common(limit):
+                text = source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ""
+                lines.append(f"  {line:>5} {count:>10}  {text}".rstrip())
+            if len(self.line_hits) > limit:
+                lines.append(f"  ... {len(self.line_hits) - limit} more lines")
+        return "\n".join(lines)
+
+    def collapsed(self):
+        """Collapsed stacks ('<main>;f;g 1234' per line, exclusive microseconds),
+        the input format of flamegraph.pl, speedscope and inferno."""
+        return "".join(f"{';'.join(stack)} {round(seconds * 1e6)}\n"
+                       for stack, seconds in sorted(self.stacks.items()) if round(seconds * 1e6) > 0)
+
+class Profiling:
+    """Mixin that profiles a tree-walking interpreter while it runs.
+
+    Every statement list goes through visit_list, which counts each
+    statement's line; a list that is a function's body also opens and closes
+    that function's activation, so argument evaluation stays in the caller.
+    Memo hits never reach the body and are read from the MemoTable at the end.
+    """
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        super().__init__(output, max_steps, timeout)
+        self.profile = Profile()
+        self.bodies = {}  # id(body list) -> FunctionDecl
+
+    def run_prepared(self, program):
+        self.profile.start()
+        try:
+            return super().run_prepared(program)
+        finally:
+            self.profile.stop()
+            for name, hits, misses, cached in self.memos.stats():
+                self.profile.memo_hits[name] = hits
+
+    def visit_list(self, nodes):
+        decl = self.bodies.get(id(nodes))
+        if decl is None:
+            return self.visit_statements(nodes)
+        self.profile.enter(decl)
+        try:
+            return self.visit_statements(nodes)
+        finally:
+            self.profile.exit()
+
+    def visit_statements(self, nodes):
+        line_hits = self.profile.line_hits
+        result = None
+        for node in nodes:
+            if type(node) is not list:  # A nested { ... } counts its own statements
+                line_hits[node.line] += 1
+            result = self.visit(node)
+        return result
+
+    def visit_FunctionDecl(self, node):
+        self.bodies[id(node.body)] = node
+        super().visit_FunctionDecl(node)
+
+    def visit_WhileBlock(self, node):
+        # Interpreter.visit_WhileBlock plus the iteration count
+        loops = self.profile.loops
+        while self.visit(node.condition):
+            loops[node.line] += 1
+            self.ticks -= 1
+            if self.ticks < 0:
+                self.ticks = self.budget.check(node.line)
+            self.visit(node.body)
+
+class ProfilingInterpreter(Profiling, Interpreter):
+    """Interpreter that records a Profile."""
+
+class LexicalProfilingInterpreter(Profiling, LexicalInterpreter):
+    """LexicalInterpreter that records a Profile."""
+
+PROFILERS = {
+    "dynamic": ProfilingInterpreter,
+    "lexical": LexicalProfilingInterpreter,
+}
+
+def get_profiler(scoping=None):
+    """Profiling backend for a scoping; profiles always run on the tree-walker."""
+    scoping = scoping or DEFAULT_SCOPING
+    get_backend("tree", scoping)  # Same error as any other unknown scoping
+    return PROFILERS[scoping]
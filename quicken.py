@@ -0,0 +1,199 @@
+from parser import *
+from errors import BaklolError
+from interpreter import Interpreter
+from closure_compiler import BINARY_OPS, op_name
+
+# Operand shapes a specialized BinOp knows how to read without visiting it
+VAR, CONST, ANY = "var", "const", "any"
+LITERALS = (Num, String, Boolean)
+
+# What a specialized BinOp knows about its operand types: UNSEEN until its
+# first run, then int or float when both operands had that type (a guarded
+# variant), else None (the generic variant, which calls op_func)
+UNSEEN = "unseen"
+NUMERIC_TYPES = (int, float)
+
+# Operators a guarded variant computes inline; on two ints or two floats
+# they do exactly what their BINARY_OPS functions do
+NUMERIC_SYMBOLS = {
+    'PLUS': '+', 'PLUS_NUMBER': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/',
+    'EQ': '==', 'NEQ': '!=', 'GT': '>', 'LT': '<', 'GTE': '>=', 'LTE': '<=',
+}
+
+# (op type, left shape, right shape, guard) -> BinOp subclass, shared by every interpreter
+_SPECIALIZED = {}
+
+# Source of the handler for each operand shape, read into 'left' or 'right'.
+# Operands are still evaluated left to right, as in Interpreter.visit_BinOp
+READ_OPERAND = {
+    VAR: ("        try:\n"
+          "            {side} = env[node.{side}.var_name]\n"
+          "        except KeyError:\n"
+          "            undeclared(node.{side})\n"),
+    CONST: "        {side} = node.{side}.value\n",
+    ANY: "        {side} = visit(node.{side})\n",
+}
+HANDLER = """\
+def make_binop(env, visit, undeclared, op, observe, guard, generic):
+    def binop(node):
+{reads}{compute}
+    return binop
+"""
+COMPUTE_GENERIC = "        return op(left, right)\n"
+COMPUTE_UNSEEN = "        return observe(node, left, right)\n"
+COMPUTE_GUARDED = """\
+        if {guards}:
+            return left {symbol} right
+        # Guard failed: back to the generic variant, for good
+        node.__class__ = generic
+        return op(left, right)
+"""
+
+# (left shape, right shape, compute source) -> make_binop, shared by every interpreter
+_HANDLER_FACTORIES = {}
+
+def operand_shape(node):
+    if isinstance(node, VarAccess):
+        return VAR
+    if type(node) in LITERALS:
+        return CONST
+    return ANY
+
+def specialized_class(op_type, left, right, guard=UNSEEN):
+    """The BinOp subclass a node with this operator, operand shapes and guard turns into.
+
+    It adds no slots, so a node can switch to it by assigning __class__, and
+    keeps the name 'BinOp', so every other 'visit_'/'check_'/'compile_'
+    dispatch by type name still treats it as a plain BinOp.
+    """
+    key = (op_type, left, right, guard)
+    cls = _SPECIALIZED.get(key)
+    if cls is None:
+        guard_name = guard if guard in (UNSEEN, None) else guard.__name__
+        cls = _SPECIALIZED[key] = type("BinOp", (BinOp,), {
+            "__slots__": (),
+            "__qualname__": f"BinOp[{op_type} {left} {right} {guard_name}]",
+            "op_type": op_type,
+            "op_func": BINARY_OPS[op_type],
+            "shapes": (left, right),
+            "guard": guard,
+        })
+    return cls
+
+def handler_factory(left, right, compute):
+    """make_binop() for these operand shapes and compute step, built from READ_OPERAND and HANDLER.
+
+    Generated like the python backend's code, because a guarded variant
+    only pays off with its operator inline: written once per operator and
+    operand shape by hand, that would be a hundred near-identical functions.
+    """
+    key = (left, right, compute)
+    factory = _HANDLER_FACTORIES.get(key)
+    if factory is None:
+        source = HANDLER.format(reads=READ_OPERAND[left].format(side="left") + READ_OPERAND[right].format(side="right"),
+                                compute=compute)
+        namespace = {}
+        exec(compile(source, f"<quicken {left} {right}>", "exec"), namespace)
+        factory = _HANDLER_FACTORIES[key] = namespace["make_binop"]
+    return factory
+
+# What a VarAccess node turns into on its first run: its handler reads the
+# variable straight from the interpreter's env, no method or attribute lookup
+QuickVarAccess = type("VarAccess", (VarAccess,), {"__slots__": (), "__qualname__": "VarAccess[quick]"})
+
+class QuickeningInterpreter(Interpreter):
+    """Interpreter whose BinOp and VarAccess nodes specialize themselves as they run.
+
+    visit() dispatches on type(node) through a dict instead of building a
+    'visit_' name and calling getattr for every node. The first time a BinOp
+    runs it rewrites its own __class__ to a variant for its operator and
+    operand shapes (variable, literal or anything else), which reads
+    variable and literal operands inline instead of visiting them.
+
+    That variant also watches the operand types of its first evaluation.
+    Two ints or two floats make it switch to a guarded variant that checks
+    they still have that type and then computes 'left < right' inline, with
+    no operator function call: 'chai > 0' and 'chai - 1' become one dict
+    lookup, two type checks and one Python operation. Anything else (strings,
+    booleans, mixed types), or a guard failing later, switches the node to
+    the generic variant, which calls the BINARY_OPS function, for good.
+    An undeclared variable operand raises exactly what the generic path does.
+
+    A VarAccess rewrites itself to QuickVarAccess, read straight from env.
+    """
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        super().__init__(output, max_steps, timeout)
+        self.handlers = {}   # node class -> function(node)
+        handlers = self.handlers
+
+        def visit(node):
+            try:
+                handler = handlers[type(node)]
+            except KeyError:
+                handler = handlers[type(node)] = self.make_handler(type(node))
+            return handler(node)
+        # An instance attribute, so every self.visit() skips method lookup too
+        self.visit = visit
+
+    def make_handler(self, cls):
+        if issubclass(cls, BinOp) and cls is not BinOp:
+            return self.make_binop_handler(cls)
+        if cls is QuickVarAccess:
+            return self.make_var_handler()
+        return getattr(self, 'visit_' + cls.__name__, self.generic_visit)
+
+    def visit_BinOp(self, node):
+        # First run of this node: specialize it and every BinOp operand under
+        # it (shapes do not depend on values), then evaluate it the new way.
+        # Quickening the operands one at a time as they ran would cost four
+        # frames per level, so long chains would hit the recursion limit.
+        pending = [node]
+        while pending:
+            binop = pending.pop()
+            if type(binop) is BinOp:
+                binop.__class__ = specialized_class(op_name(binop), operand_shape(binop.left),
+                                                    operand_shape(binop.right))
+                pending.append(binop.right)
+                pending.append(binop.left)
+        return self.visit(node)
+
+    def visit_VarAccess(self, node):
+        node.__class__ = QuickVarAccess
+        return self.visit(node)
+
+    def make_var_handler(self):
+        env = self.global_env
+
+        def var_access(node):
+            try:
+                return env[node.var_name]
+            except KeyError:
+                raise BaklolError(f"Variable '{node.var_name}' dhoond rahe ho? Pehle declare to karo!", node.line) from None
+        return var_access
+
+    def make_binop_handler(self, cls):
+        left_shape, right_shape = cls.shapes
+        if cls.guard is UNSEEN:
+            compute = COMPUTE_UNSEEN
+        elif cls.guard is None:
+            compute = COMPUTE_GENERIC
+        else:
+            # A literal keeps the type it was observed with, only variables and expressions can change
+            guards = " and ".join(f"type({side}) is guard" for side, shape in (("left", left_shape), ("right", right_shape))
+                                  if shape != CONST)
+            compute = COMPUTE_GUARDED.format(guards=guards or "True", symbol=NUMERIC_SYMBOLS[cls.op_type])
+
+        def undeclared(var):
+            raise BaklolError(f"Variable '{var.var_name}' dhoond rahe ho? Pehle declare to karo!", var.line) from None
+
+        def observe(node, left, right):
+            # First evaluation of this node: pick its variant from the operand types
+            kind = type(left)
+            guard = kind if kind is type(right) and kind in NUMERIC_TYPES else None
+            node.__class__ = specialized_class(cls.op_type, left_shape, right_shape, guard)
+            return cls.op_func(left, right)
+
+        return handler_factory(left_shape, right_shape, compute)(
+            self.global_env, self.visit, undeclared, cls.op_func, observe, cls.guard,
+            specialized_class(cls.op_type, left_shape, right_shape, None))
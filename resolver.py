@@ -0,0 +1,224 @@
+from parser import *
+from errors import BaklolError
+from interpreter import Interpreter, ReturnValue
+from memo import check_purity
+
+# Value of a slot whose variable has not been declared (yet) at runtime
+UNSET = object()
+
+class Scope:
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.slots = {} # name -> slot index; slot 0 of a frame is the parent frame
+
+    def declare(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots) + 1
+        return self.slots[name]
+
+    def frame_size(self):
+        return len(self.slots) + 1
+
+class ResolvedProgram:
+    def __init__(self, tree, global_frame_size):
+        self.tree = tree
+        self.global_frame_size = global_frame_size
+
+class Resolver:
+    """Static resolution pass for lexical scoping.
+
+    Every kaam/rangbaaj body is one scope holding its params and every
+    'hum_rakhte_hain' inside it (blocks do not open scopes); the top level is
+    the global scope. Each VarDecl, VarAccess and VarAssign is annotated with
+    (depth, slot): how many function scopes to walk out, and which slot of
+    that frame holds the variable. depth is -1 when the name is never
+    declared anywhere in scope. FunctionDecls get frame_size, param_slots
+    and an empty_frame template.
+    """
+
+    def __init__(self):
+        self.scope = None
+
+    def resolve(self, tree):
+        self.scope = Scope()
+        self.declare_all(tree, self.scope)
+        self.visit(tree)
+        return ResolvedProgram(tree, self.scope.frame_size())
+
+    def declare_all(self, node, scope):
+        # Collect declarations of one scope, without entering nested functions
+        if isinstance(node, list):
+            for stmt in node:
+                self.declare_all(stmt, scope)
+        elif isinstance(node, VarDecl):
+            scope.declare(node.var_name)
+        elif isinstance(node, IfBlock):
+            self.declare_all(node.body, scope)
+            if node.else_body:
+                self.declare_all(node.else_body, scope)
+        elif isinstance(node, (WhileBlock, BhaukaalBlock)):
+            self.declare_all(node.body, scope)
+
+    def lookup(self, name):
+        depth = 0
+        scope = self.scope
+        while scope is not None:
+            if name in scope.slots:
+                return depth, scope.slots[name]
+            scope = scope.parent
+            depth += 1
+        return -1, 0
+
+    def visit(self, node):
+        if isinstance(node, list):
+            for stmt in node:
+                self.visit(stmt)
+            return
+        method_name = 'resolve_' + type(node).__name__
+        resolver = getattr(self, method_name, self.generic_resolve)
+        resolver(node)
+
+    def generic_resolve(self, node):
+        # Literals, Throw, NoOp: nothing to resolve
+        pass
+
+    def resolve_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def resolve_Negate(self, node):
+        self.visit(node.expression)
+
+    def resolve_VarDecl(self, node):
+        self.visit(node.expression)
+        node.depth, node.slot = 0, self.scope.slots[node.var_name]
+
+    def resolve_VarAccess(self, node):
+        node.depth, node.slot = self.lookup(node.var_name)
+
+    def resolve_VarAssign(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        node.depth, node.slot = node.left.depth, node.left.slot
+
+    def resolve_Print(self, node):
+        self.visit(node.expression)
+
+    def resolve_IfBlock(self, node):
+        self.visit(node.condition)
+        self.visit(node.body)
+        if node.else_body:
+            self.visit(node.else_body)
+
+    def resolve_WhileBlock(self, node):
+        self.visit(node.condition)
+        self.visit(node.body)
+
+    def resolve_BhaukaalBlock(self, node):
+        self.visit(node.body)
+
+    def resolve_FunctionDecl(self, node):
+        scope = Scope(self.scope)
+        node.param_slots = [scope.declare(param) for param in node.params]
+        self.declare_all(node.body, scope)
+        node.frame_size = scope.frame_size()
+        # Copied for every call: slot 0 gets the parent frame, the rest start UNSET
+        node.empty_frame = [None] + [UNSET] * (node.frame_size - 1)
+
+        outer = self.scope
+        self.scope = scope
+        self.visit(node.body)
+        self.scope = outer
+
+    def resolve_FunctionCall(self, node):
+        for arg in node.args:
+            self.visit(arg)
+
+    def resolve_Return(self, node):
+        self.visit(node.expression)
+
+
+class LexicalInterpreter(Interpreter):
+    """Tree-walker with lexical scoping and array-backed frames.
+
+    Opt-in alternative to the dynamic scoping of Interpreter: a call gets a
+    fresh frame (a list) linked to the frame its function was declared in,
+    and variables are read by (depth, slot) from the Resolver instead of by
+    name from global_env. Run it through prepare()/run_prepared().
+    """
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        super().__init__(output, max_steps, timeout)
+        self.frame = None
+
+    def prepare(self, tree):
+        program = Resolver().resolve(tree)
+        check_purity(program.tree, lexical=True)
+        return program
+
+    def run_prepared(self, program):
+        self.frame = [None] + [UNSET] * (program.global_frame_size - 1)
+        self.ticks = self.budget.start()
+        return self.visit(program.tree)
+
+    def frame_at(self, depth):
+        frame = self.frame
+        while depth:
+            frame = frame[0]
+            depth -= 1
+        return frame
+
+    def visit_VarDecl(self, node):
+        val = self.visit(node.expression)
+        self.frame[node.slot] = val
+
+    def visit_VarAccess(self, node):
+        depth = node.depth
+        if depth == 0:
+            value = self.frame[node.slot]
+        elif depth > 0:
+            value = self.frame_at(depth)[node.slot]
+        else:
+            value = UNSET
+        if value is UNSET:
+            raise BaklolError(f"Variable '{node.var_name}' dhoond rahe ho? Pehle declare to karo!", node.line)
+        return value
+
+    def visit_VarAssign(self, node):
+        frame = self.frame_at(node.depth) if node.depth >= 0 else None
+        if frame is None or frame[node.slot] is UNSET:
+            raise BaklolError(f"Variable '{node.left.var_name}' declare nahi kiya hai be.", node.line)
+        frame[node.slot] = self.visit(node.right)
+
+    def visit_FunctionDecl(self, node):
+        # Remember the declaring frame, so the body can see its enclosing scopes
+        self.functions[node.name] = (node, self.frame)
+        self.memos.declare(node.name, node.is_expert, node.memoize, node.impurity, node.line)
+
+    def visit_FunctionCall(self, node):
+        self.ticks -= 1
+        if self.ticks < 0:
+            self.ticks = self.budget.check(node.line)
+        if node.name not in self.functions:
+            raise BaklolError(f"Function '{node.name}' kaun banayega? Hum?", node.line)
+
+        func_def, parent_frame = self.functions[node.name]
+        if len(node.args) != len(func_def.params):
+            raise BaklolError(f"Function '{node.name}' maang raha hai {len(func_def.params)} arguments, tum diye {len(node.args)}.", node.line)
+
+        frame = func_def.empty_frame.copy()
+        frame[0] = parent_frame
+        for slot, arg in zip(func_def.param_slots, node.args):
+            frame[slot] = self.visit(arg)
+
+        caller_frame = self.frame
+        self.frame = frame
+        try:
+            if func_def.memoize:
+                arg_vals = [frame[slot] for slot in func_def.param_slots]
+                return self.call_memoized(self.memos.get(node.name), arg_vals, func_def.body)
+            self.visit(func_def.body)
+        except ReturnValue as r:
+            return r.value
+        finally:
+            self.frame = caller_frame
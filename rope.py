@@ -0,0 +1,124 @@
+import os
+import operator
+
+# Joined strings shorter than this stay plain str: copying them is cheaper
+# than keeping pieces around
+ROPE_MIN = int(os.environ.get("KANP_ROPE_MIN", 256))
+
+class Rope:
+    """A string built by '+', kept as its pieces until someone looks at it.
+
+    Appending to a Rope adds a piece instead of copying everything built so
+    far, so a jabtak loop doing s = s + "..." is linear, not quadratic.
+    Ropes share their piece list: a Rope owns the pieces up to its count,
+    and appending to the newest Rope just extends the list. Appending to an
+    older one (a = s + "x" after b = s + "y") copies its pieces first, so
+    values never change under anyone.
+
+    It is flattened to one str (and cached) only when needed: printing
+    (str()), comparing, hashing, and any operation other than '+'. Those go
+    through the flat str, so results and error messages are exactly the
+    ones a plain str gives; nothing outside this module sees a difference.
+    """
+
+    __slots__ = ("pieces", "count", "length", "flat")
+
+    def __init__(self, pieces, count, length):
+        self.pieces = pieces
+        self.count = count
+        self.length = length
+        self.flat = None
+
+    def __str__(self):
+        if self.flat is None:
+            self.flat = "".join(self.pieces[:self.count])
+        return self.flat
+
+    def appended(self, pieces, length):
+        """This rope followed by pieces (a list of str)."""
+        if len(self.pieces) == self.count:
+            # Newest rope on this list: extend it in place
+            self.pieces.extend(pieces)
+            return Rope(self.pieces, len(self.pieces), self.length + length)
+        own = self.pieces[:self.count] + pieces
+        return Rope(own, len(own), self.length + length)
+
+    def __add__(self, other):
+        if type(other) is str:
+            return self.appended([other], len(other))
+        if type(other) is Rope:
+            return self.appended(other.pieces[:other.count], other.length)
+        return str(self) + other  # Raises str's own TypeError
+
+    def __radd__(self, other):
+        if type(other) is str:
+            return Rope([other] + self.pieces[:self.count], self.count + 1, len(other) + self.length)
+        return other + str(self)
+
+    def __len__(self):
+        return self.length
+
+    def __bool__(self):
+        return self.length > 0
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def compare(self, other, op):
+        if type(other) is Rope:
+            other = str(other)
+        elif type(other) is not str:
+            return NotImplemented  # Python then raises (or answers ==) as for a str
+        return op(str(self), other)
+
+    def __eq__(self, other):
+        return self.compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self.compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self.compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self.compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self.compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self.compare(other, operator.ge)
+
+    def __mul__(self, other):
+        return str(self) * other
+
+    def __rmul__(self, other):
+        return other * str(self)
+
+    # No __sub__/__truediv__: str has none either, and the TypeError Python
+    # raises names the type, which is why the class calls itself 'str'
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __repr__(self):
+        return repr(str(self))
+
+# Python's TypeErrors name operand types, e.g. "unsupported operand type(s)
+# for -: 'str' and 'int'"; with this they read the same for a Rope
+Rope.__name__ = "str"
+
+def flatten(value):
+    """value, with a Rope turned into its str."""
+    return str(value) if type(value) is Rope else value
+
+def add(left, right):
+    """KanpScript '+': Python's, except that long string results become Ropes."""
+    if type(left) is not str:
+        # Numbers as usual; a Rope on the left appends itself
+        return left + right
+    if type(right) is str:
+        if len(left) + len(right) < ROPE_MIN:
+            return left + right
+        return Rope([left, right], 2, len(left) + len(right))
+    return left + right  # str + Rope goes to Rope.__radd__, str + number raises as usual
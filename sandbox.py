@@ -0,0 +1,184 @@
+import os
+import math
+import queue
+import threading
+import signal
+import time
+import multiprocessing
+from errors import BhaukaalError
+
+try:
+    import resource
+except ImportError:
+    # No rlimits on this platform (Windows): jobs still run in worker
+    # processes, only the wall-clock timeout is enforced
+    resource = None
+
+# Imported once in the forkserver, so every forked worker starts warm
+PRELOAD = ["lexer", "parser", "interpreter", "closure_compiler", "bytecode", "vm", "transpiler", "backends"]
+
+class CpuLimitExceeded(BaseException):
+    # BaseException, so neither bhaukaal nor run_program's except Exception can swallow it
+    pass
+
+def _cpu_exceeded(signum, frame):
+    raise CpuLimitExceeded()
+
+def _cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _limit_message(message):
+    return str(BhaukaalError(message, 0)) + "\n"
+
+def _worker_main(conn, runner, cpu_seconds, memory_bytes):
+    """Worker process loop: receive a job, run it under the limits, send back the result.
+
+    A job is (args, streaming). A streaming job's runner also gets send=, which
+    forwards its output to the parent as ("chunk", text) messages. Ends with
+    ("done", result, recycle); recycle asks the pool to replace this worker.
+    """
+    def send_chunk(text):
+        conn.send(("chunk", text))
+
+    if resource is not None:
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        if cpu_seconds:
+            signal.signal(signal.SIGXCPU, _cpu_exceeded)
+    # Ctrl+C on the server is for the parent, which shuts workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        try:
+            job, streaming = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        recycle = False
+        try:
+            if resource is not None and cpu_seconds:
+                # RLIMIT_CPU counts the whole process, so move the soft limit per job
+                _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+                soft = math.ceil(_cpu_used()) + cpu_seconds
+                if hard != resource.RLIM_INFINITY:
+                    soft = min(soft, hard)
+                resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+            result = runner(*job, send=send_chunk) if streaming else runner(*job)
+        except CpuLimitExceeded:
+            result = (False, _limit_message(f"CPU time ki limit ({cpu_seconds}s) khatam, program rok diya."))
+            recycle = True
+        except MemoryError:
+            result = (False, _limit_message("Memory ki limit khatam, program rok diya."))
+            recycle = True
+
+        if resource is not None and memory_bytes:
+            # A job that bloated the heap leaves it bloated; start fresh instead
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            recycle = recycle or peak > memory_bytes // 2
+        conn.send(("done", result, recycle))
+
+class Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+    def close(self, kill=False):
+        self.conn.close()
+        if kill:
+            self.process.kill()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+class SandboxPool:
+    """Pool of pre-forked worker processes that run jobs under CPU and memory limits.
+
+    run(*job) calls runner(*job) in an idle worker and returns its result, so
+    a runaway program burns its own process instead of the server. Workers
+    are replaced after max_jobs jobs, after hitting a limit, or when a job
+    does not finish within timeout seconds (wall clock, covers sleeping and
+    blocked jobs too). Safe to call from many threads: each call checks out
+    its own worker, and waits for it without holding the GIL.
+    """
+
+    def __init__(self, runner, workers=None, max_jobs=100, cpu_seconds=5,
+                 memory_bytes=256 * 1024 * 1024, timeout=None, preload=PRELOAD):
+        self.runner = runner
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout or (cpu_seconds * 2 if cpu_seconds else None)
+        self.recycled = 0
+        self.lock = threading.Lock()   # for recycled; workers move through the idle queue
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context("forkserver")
+            self.context.set_forkserver_preload(preload)
+        else:
+            self.context = multiprocessing.get_context("spawn")
+
+        self.idle = queue.Queue()
+        for _ in range(self.workers):
+            self.idle.put(self.spawn())
+
+    def spawn(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.runner, self.cpu_seconds, self.memory_bytes),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return Worker(process, parent_conn)
+
+    def run(self, *job):
+        return self.call(job)
+
+    def stream(self, write, *job):
+        """Like run(), but runner gets send= and its output reaches write(text) as it is printed."""
+        return self.call(job, write)
+
+    def call(self, job, write=None):
+        worker = self.idle.get()
+        recycle, kill = False, False
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        try:
+            worker.conn.send((job, write is not None))
+            while True:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                if not worker.conn.poll(remaining):
+                    result = (False, _limit_message(f"Program {self.timeout}s me khatam nahi hua, rok diya."))
+                    recycle, kill = True, True
+                    break
+                message = worker.conn.recv()
+                if message[0] == "chunk":
+                    write(message[1])
+                    continue
+                _, result, recycle = message
+                break
+        except (EOFError, OSError):
+            # Worker died mid-job, e.g. killed by the kernel for a hard limit
+            result = (False, _limit_message("Sandbox worker hi mar gaya, program rok diya."))
+            recycle, kill = True, True
+        except BaseException:
+            # write() gave up on the job, the worker is still running it
+            recycle, kill = True, True
+            raise
+        finally:
+            worker.jobs += 1
+            if recycle or worker.jobs >= self.max_jobs:
+                worker.close(kill)
+                with self.lock:
+                    self.recycled += 1
+                worker = self.spawn()
+            self.idle.put(worker)
+        return result
+
+    def close(self):
+        for _ in range(self.workers):
+            self.idle.get().close()
@@ -1,22 +1,350 @@
 import http.server
-import socketserver
 import json
 import sys
-import io
 import os
+import math
+import time
+import functools
+import multiprocessing
+from urllib.parse import urlsplit, unquote
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # Add parent dir to path to import interpreter modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from lexer import Lexer
+from lexer import FastLexer
 from parser import Parser
-from interpreter import Interpreter
-from errors import KanpError
+from backends import DEFAULT_BACKEND, DEFAULT_SCOPING, get_backend
+from program_cache import ProgramCache
+from incremental import IncrementalParser
+import metrics
+from profiler import get_profiler
+from sandbox import SandboxPool
+from static_cache import StaticCache
+from errors import KanpError, ThakGayaError
 
 PORT = int(os.environ.get("PORT", 8000))
+# Threads handling connections; one slow /run only ties up its own worker
+WORKERS = int(os.environ.get("KANP_SERVER_WORKERS", 16))
+# "thread": /run executes in the handler thread. "sandbox": in a pool of
+# worker processes with CPU/memory limits, see sandbox.SandboxPool.
+RUN_MODE = os.environ.get("KANP_RUN_MODE", "thread")
+SANDBOX = None
+# Caps on every /run (0 disables); a request may ask for less, never more
+MAX_STEPS = int(os.environ.get("KANP_MAX_STEPS", 10_000_000)) or None
+RUN_TIMEOUT = float(os.environ.get("KANP_RUN_TIMEOUT", 10)) or None
+MAX_OUTPUT = int(os.environ.get("KANP_MAX_OUTPUT_BYTES", 1024 * 1024)) or None
+# /run/batch: programs per request, and processes running them in thread mode
+BATCH_MAX_PROGRAMS = int(os.environ.get("KANP_BATCH_MAX_PROGRAMS", 1000))
+BATCH_WORKERS = int(os.environ.get("KANP_BATCH_WORKERS", 0)) or None
+BATCH = None
+
+# Parsed/compiled programs, so resubmitted code only pays for execution
+PROGRAM_CACHE = ProgramCache(
+    max_entries=int(os.environ.get("KANP_PROGRAM_CACHE_ENTRIES", 256)),
+    max_bytes=int(os.environ.get("KANP_PROGRAM_CACHE_BYTES", 32 * 1024 * 1024)),
+)
+
+# Parsed top-level statements, so an edited resubmission only re-parses what changed.
+# KANP_INCREMENTAL_PARSE=0 lexes and parses every program whole as before.
+INCREMENTAL = IncrementalParser(
+    max_entries=int(os.environ.get("KANP_FRAGMENT_CACHE_ENTRIES", 16384)),
+    max_bytes=int(os.environ.get("KANP_FRAGMENT_CACHE_BYTES", 16 * 1024 * 1024)),
+) if os.environ.get("KANP_INCREMENTAL_PARSE", "1") != "0" else None
+
+# Files under web/ served from memory with ETags and gzip/brotli variants.
+# KANP_STATIC_CACHE=0 serves them straight from disk as before.
+STATIC = StaticCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "web"),
+    max_file_bytes=int(os.environ.get("KANP_STATIC_MAX_FILE_BYTES", 4 * 1024 * 1024)),
+) if os.environ.get("KANP_STATIC_CACHE", "1") != "0" else None
+# Seconds between checks of cached files for edits (0: never reload)
+STATIC_WATCH_INTERVAL = float(os.environ.get("KANP_STATIC_WATCH_INTERVAL", 1.0))
+
+# Prometheus metrics, served at /metrics. Sandbox workers and /run/batch
+# processes send their programs' phase, output and error samples back with
+# each result (run_recorded). Cache metrics are this process's caches.
+ROUTES = ('/run', '/run/stream', '/run/batch', '/metrics')
+REQUESTS = metrics.Counter("kanp_http_requests_total", "HTTP requests answered, by route and status code",
+                           ("route", "status"))
+REQUEST_SECONDS = metrics.Histogram("kanp_http_request_duration_seconds", "Time to answer a request, by route",
+                                    ("route",))
+IN_FLIGHT = metrics.Gauge("kanp_http_requests_in_flight", "Requests being answered right now")
+PHASE_SECONDS = metrics.Histogram("kanp_run_phase_seconds", "Time programs spent in each phase "
+                                  "(lex, parse, prepare, execute); a program cache hit skips all but execute",
+                                  ("phase", "backend"))
+OUTPUT_BYTES = metrics.Counter("kanp_run_output_bytes_total", "Bytes printed by programs", ("backend",))
+RUN_ERRORS = metrics.Counter("kanp_run_errors_total", "Programs that stopped with an error, by error type",
+                             ("error_type",))
+
+def record_run(kind, value, *labels):
+    """Records one sample from run_program: ('phase', seconds, phase, backend),
+    ('output', bytes, backend) or ('error', 1, error type)."""
+    if kind == "phase":
+        PHASE_SECONDS.observe(value, *labels)
+    elif kind == "output":
+        OUTPUT_BYTES.inc(*labels, amount=value)
+    else:
+        RUN_ERRORS.inc(*labels, amount=value)
+
+def route_label(path):
+    """Route a request is counted under; static files and unknown paths share one each."""
+    path = urlsplit(path).path
+    if path in ROUTES:
+        return path
+    return "static" if path.startswith('/web/') else "other"
+
+def cache_metrics():
+    """Hit and miss counts of the caches this server has, read when /metrics is scraped."""
+    caches = [("program", PROGRAM_CACHE.stats())]
+    if INCREMENTAL is not None:
+        caches.append(("fragment", INCREMENTAL.stats()))
+    if STATIC is not None:
+        stats = STATIC.stats()
+        caches.append(("static", dict(stats, entries=stats["files"])))
+    def rate(stats):
+        lookups = stats["hits"] + stats["misses"]
+        return stats["hits"] / lookups if lookups else 0.0
+    return (metrics.render("kanp_cache_hits_total", "counter", "Cache lookups answered from the cache",
+                           ("cache",), [((name,), stats["hits"]) for name, stats in caches])
+            + metrics.render("kanp_cache_misses_total", "counter", "Cache lookups that had to compute or load",
+                             ("cache",), [((name,), stats["misses"]) for name, stats in caches])
+            + metrics.render("kanp_cache_hit_ratio", "gauge", "Hits over all lookups since start",
+                             ("cache",), [((name,), rate(stats)) for name, stats in caches])
+            + metrics.render("kanp_cache_entries", "gauge", "Entries held in the cache",
+                             ("cache",), [((name,), stats["entries"]) for name, stats in caches]))
+
+def metrics_text():
+    parts = [metric.render() for metric in (REQUESTS, REQUEST_SECONDS, IN_FLIGHT, PHASE_SECONDS,
+                                            OUTPUT_BYTES, RUN_ERRORS)]
+    parts.append(cache_metrics())
+    return "".join(parts)
+
+def limit(requested, cap, cast):
+    """Per-request limit from the JSON body, never above the server's cap."""
+    try:
+        value = cast(requested)
+    except (TypeError, ValueError, OverflowError):  # OverflowError: int() of JSON's Infinity
+        return cap
+    # NaN passes every comparison check and min(nan, cap) is nan: a deadline that never comes
+    if not math.isfinite(value) or value <= 0:
+        return cap
+    return value if cap is None or value < cap else cap
+
+class ChunkedOutput:
+    """File-like sink for bol output that hands it on in batches.
+
+    Text is buffered and passed to send(text) once chunk_bytes have built up,
+    or at the end of a line flush_interval seconds after the last send; the
+    first line goes out at once, so the client sees output right away. close()
+    sends the rest, chunk_bytes=None keeps everything until then. Printing
+    past max_bytes raises ThakGayaError, which bhaukaal cannot catch.
+    """
+
+    def __init__(self, send, max_bytes=None, chunk_bytes=4096, flush_interval=0.05):
+        self.send = send
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.buffered = 0
+        self.written = 0
+        self.last_flush = None
+
+    def write(self, text):
+        size = len(text.encode("utf-8"))
+        if self.max_bytes is not None and self.written + size > self.max_bytes:
+            raise ThakGayaError(f"Output ki limit ({self.max_bytes} bytes) khatam, aur nahi chhapenge.", 0)
+        self.written += size
+        self.buffer.append(text)
+        self.buffered += size
+        if self.chunk_bytes is None:
+            return len(text)
+        if self.buffered >= self.chunk_bytes:
+            self.flush()
+        elif text.endswith("\n") and (self.last_flush is None or time.monotonic() - self.last_flush >= self.flush_interval):
+            # Only at the end of a line: print() writes the value and the newline separately
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            text = "".join(self.buffer)
+            self.buffer.clear()
+            self.buffered = 0
+            self.send(text)
+        self.last_flush = time.monotonic()
+
+    def discard(self):
+        self.buffer.clear()
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+
+def run_program(code, backend=DEFAULT_BACKEND, scoping=DEFAULT_SCOPING, max_steps=None, timeout=None,
+                max_output=None, profile=False, send=None, record=record_run):
+    """Runs one /run submission.
+
+    Without send, returns (success, output) with the status line at the end
+    of the output. With send, output is passed to send(text) in chunks while
+    the program runs, and (success, status) is returned. With profile the
+    program runs on the profiling tree-walker and the result gets a third
+    item, {'report': text, 'collapsed': collapsed stacks}. Metric samples
+    go to record (see record_run).
+    """
+    def timed(phase):
+        return metrics.Timer(functools.partial(record, "phase"), (phase, backend))
+
+    # Each run writes to its own buffer, so concurrent requests never mix output
+    if send is None:
+        chunks = []
+        output = ChunkedOutput(chunks.append, max_output, chunk_bytes=None)
+    else:
+        output = ChunkedOutput(send, max_output)
+    interpreter = None
+    try:
+        if profile:
+            backend = "profile"  # Any backend is profiled on the tree-walker
+            interpreter = get_profiler(scoping)(output=output, max_steps=max_steps, timeout=timeout)
+        else:
+            interpreter = get_backend(backend, scoping)(output=output, max_steps=max_steps, timeout=timeout)
+        # Budgeted and unbudgeted runs may prepare differently (python backend)
+        budgeted = "budget" if interpreter.budget.enabled else "free"
+        cache_key = PROGRAM_CACHE.make_key(code, f"{backend}/{scoping}/{budgeted}")
+        program = PROGRAM_CACHE.get(cache_key)
+        if program is None:
+            if INCREMENTAL is not None:
+                # Lexing happens statement by statement inside the parse, timed apart
+                times = {"lex": 0.0}
+                start = time.perf_counter()
+                try:
+                    ast = INCREMENTAL.parse(code, times)
+                finally:
+                    record("phase", times["lex"], "lex", backend)
+                    record("phase", time.perf_counter() - start - times["lex"], "parse", backend)
+            else:
+                with timed("lex"):
+                    lexer = FastLexer(code)
+                    tokens = lexer.tokenize()
+                with timed("parse"):
+                    parser = Parser(tokens)
+                    ast = parser.parse()
+            with timed("prepare"):
+                program = interpreter.prepare(ast)
+            PROGRAM_CACHE.put(cache_key, program, len(code))
+        with timed("execute"):
+            interpreter.run_prepared(program)
+
+        status = "\n✅ Execution Complete: Sab chaukas chal raha hai"
+        success = True
+    except KanpError as e:
+        status = str(e)
+        success = False
+        record("error", 1, type(e).__name__)
+    except MemoryError:
+        output.discard()  # Drop whatever was printed and not sent yet, it may be what filled memory
+        status = "❌ BaklolError: Memory khatam ho gayi, program rok diya."
+        success = False
+        record("error", 1, "MemoryError")
+    except Exception as e:
+        status = f"❌ BaklolError: System fat gaya.\n{str(e)}"
+        success = False
+        record("error", 1, type(e).__name__)
+    if interpreter is not None and interpreter.memos.warnings:
+        status = "".join(str(warning) for warning in interpreter.memos.warnings) + status
+    output.close()
+    if interpreter is not None:  # Only a backend that exists becomes a label
+        record("output", output.written, backend)
+    result = (success, status) if send is not None else (success, "".join(chunks) + status + "\n")
+    if profile and interpreter is not None:
+        result += ({'report': interpreter.profile.report(code), 'collapsed': interpreter.profile.collapsed()},)
+    return result
+
+def run_recorded(*job, send=None):
+    """run_program for worker processes (sandbox, /run/batch): (its result, its metric samples).
+
+    Their metrics would stay in the worker, so the samples travel back with
+    the result and unwrap_recorded() records them here.
+    """
+    samples = []
+    result = run_program(*job, send=send, record=lambda *sample: samples.append(sample))
+    return result, samples
+
+def unwrap_recorded(result):
+    """The run_program result inside a run_recorded one, its samples recorded.
+
+    Results the sandbox makes up itself (limits hit, a dead worker) are
+    plain run_program-style results and pass through.
+    """
+    if isinstance(result[0], tuple):
+        result, samples = result
+        for sample in samples:
+            record_run(*sample)
+    return result
+
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+    """HTTPServer that hands every connection to a fixed pool of worker threads."""
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kanp-worker")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
 
 class KanpHandler(http.server.SimpleHTTPRequestHandler):
+    def handle_one_request(self):
+        self.request_start = None
+        self.status_code = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.request_start is not None:
+                IN_FLIGHT.dec()
+                route = route_label(self.path)
+                REQUEST_SECONDS.observe(time.perf_counter() - self.request_start, route)
+                if self.status_code is not None:
+                    REQUESTS.inc(route, str(self.status_code))
+
+    def parse_request(self):
+        # Counted from here, not while an idle connection waits for its request line
+        self.request_start = time.perf_counter()
+        self.path = ''  # Not set when the request line itself is bad
+        IN_FLIGHT.inc()
+        return super().parse_request()
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
     def do_GET(self):
+        if urlsplit(self.path).path == '/metrics':
+            return self.send_metrics()
+        self.map_path()
+        if not self.send_static():
+            return http.server.SimpleHTTPRequestHandler.do_GET(self)
+
+    def do_HEAD(self):
+        self.map_path()
+        if not self.send_static(head_only=True):
+            return http.server.SimpleHTTPRequestHandler.do_HEAD(self)
+
+    def map_path(self):
         # Mapping URLs to file paths in 'web' folder
         if self.path == '/':
             self.path = '/web/index.html'
@@ -37,49 +365,218 @@ class KanpHandler(http.server.SimpleHTTPRequestHandler):
         elif self.path.startswith('/css/'):
             # Allow serving css from web/css
             self.path = '/web' + self.path
-        
-        return http.server.SimpleHTTPRequestHandler.do_GET(self)
+
+    def send_static(self, head_only=False):
+        """Serves self.path from STATIC if it is a file under web/, else returns False."""
+        path = unquote(urlsplit(self.path).path)
+        if STATIC is None or not path.startswith('/web/'):
+            return False
+        asset = STATIC.get(path[len('/web/'):])
+        if asset is None:
+            return False
+
+        encoding, body, etag = asset.select(self.headers.get('Accept-Encoding'))
+        if asset.matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            body = b''
+        else:
+            self.send_response(200)
+            self.send_header('Content-type', asset.content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Last-Modified', asset.last_modified)
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', asset.cache_control)
+        if len(asset.variants) > 1:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        if body and not head_only:
+            self.wfile.write(body)
+        return True
+
+    def send_metrics(self):
+        body = metrics_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', metrics.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         if self.path == '/run':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            code = data.get('code', '')
+            success, output, *profile = self.run_job(self.read_job())
+            response = {'success': success, 'output': output}
+            if profile:
+                response['profile'] = profile[0]
 
-            # Capture stdout
-            old_stdout = sys.stdout
-            new_stdout = io.StringIO()
-            sys.stdout = new_stdout
-
-            response = {}
-            try:
-                # Run the interpreter logic
-                lexer = Lexer(code)
-                tokens = lexer.tokenize()
-                parser = Parser(tokens)
-                ast = parser.parse()
-                interpreter = Interpreter()
-                interpreter.visit(ast)
-                
-                print("\n✅ Execution Complete: Sab chaukas chal raha hai")
-                response['success'] = True
-            except KanpError as e:
-                print(str(e))
-                response['success'] = False
-            except Exception as e:
-                print(f"❌ BaklolError: System fat gaya.\n{str(e)}")
-                response['success'] = False
-            finally:
-                sys.stdout = old_stdout
-
-            response['output'] = new_stdout.getvalue()
-            
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.end_headers()
             self.wfile.write(json.dumps(response).encode('utf-8'))
+        elif self.path == '/run/stream':
+            self.stream_job(self.read_job())
+        elif self.path == '/run/batch':
+            self.run_batch(self.read_body())
+
+    def read_body(self):
+        content_length = int(self.headers['Content-Length'])
+        return self.rfile.read(content_length).decode('utf-8')
+
+    def read_job(self):
+        """Arguments for run_program from the JSON body of a /run request."""
+        return self.make_job(json.loads(self.read_body()))
+
+    @staticmethod
+    def make_job(data):
+        return (
+            data.get('code', ''),
+            data.get('backend') or DEFAULT_BACKEND,
+            data.get('scoping') or DEFAULT_SCOPING,
+            limit(data.get('max_steps'), MAX_STEPS, int),
+            limit(data.get('timeout'), RUN_TIMEOUT, float),
+            limit(data.get('max_output'), MAX_OUTPUT, int),
+            bool(data.get('profile')),
+        )
+
+    def run_job(self, job, send=None):
+        if SANDBOX is not None:
+            return unwrap_recorded(SANDBOX.run(*job) if send is None else SANDBOX.stream(send, *job))
+        return run_program(*job, send=send)
+
+    def stream_job(self, job):
+        """Server-Sent Events: 'output' events while the program prints, then one 'done'.
+
+        Plain HTTP/1.0 with no Content-Length, the stream ends when the
+        connection closes. Every event is written straight to the socket.
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')  # Keeps nginx-style proxies from buffering it back up
+        self.end_headers()
+
+        def send_event(event, data):
+            try:
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+            except OSError:
+                # The client went away; stop the program instead of running it for nobody
+                raise ThakGayaError("Sunne wala chala gaya, program rok diya.", 0)
+
+        try:
+            success, status, *profile = self.run_job(job, lambda text: send_event('output', {'text': text}))
+            done = {'success': success, 'status': status}
+            if profile:
+                done['profile'] = profile[0]
+            send_event('done', done)
+        except ThakGayaError:
+            self.close_connection = True
+
+    def run_batch(self, body):
+        """Runs many programs at once, answering with one JSON line per program as it finishes.
+
+        The body is a JSON array or newline-delimited JSON; every item is a
+        /run body (or just the code as a string) and may carry an 'id' that
+        is echoed back. Results come in finishing order with the item's
+        index, followed by one summary line.
+        """
+        stripped = body.lstrip()
+        try:
+            if stripped.startswith('['):
+                items = json.loads(stripped)
+            else:
+                items = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+        except json.JSONDecodeError as e:
+            self.send_error(400, f"Batch ka JSON hi kharab hai: {e}")
+            return
+        if len(items) > BATCH_MAX_PROGRAMS:
+            self.send_error(413, f"Ek batch me {BATCH_MAX_PROGRAMS} se zyada program nahi chalenge")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+
+        start = time.perf_counter()
+        futures = {}
+        passed = 0
+        try:
+            for index, item in enumerate(items):
+                if isinstance(item, str):
+                    item = {'code': item}
+                if not isinstance(item, dict):
+                    self.write_line({'index': index, 'id': None, 'success': False,
+                                     'output': "❌ BaklolError: Program ek JSON object hona chahiye."})
+                    continue
+                futures[submit_batch_job(self.make_job(item))] = (index, item.get('id'))
+
+            for future in as_completed(futures):
+                index, item_id = futures[future]
+                try:
+                    success, output, *profile = unwrap_recorded(future.result())
+                except Exception as e:
+                    success, output, profile = False, f"❌ BaklolError: System fat gaya.\n{str(e)}", None
+                passed += success
+                line = {'index': index, 'id': item_id, 'success': success, 'output': output}
+                if profile:
+                    line['profile'] = profile[0]
+                self.write_line(line)
+
+            self.write_line({'done': True, 'total': len(items), 'passed': passed,
+                             'failed': len(items) - passed, 'seconds': round(time.perf_counter() - start, 3)})
+        except OSError:
+            # The client went away: drop what has not started yet
+            for future in futures:
+                future.cancel()
+            self.close_connection = True
+
+    def write_line(self, data):
+        self.wfile.write((json.dumps(data) + "\n").encode('utf-8'))
+
+def submit_batch_job(job):
+    if SANDBOX is not None:
+        # A thread per sandbox worker, each waiting on its own process
+        return BATCH.submit(SANDBOX.run, *job)
+    return BATCH.submit(run_recorded, *job)
+
+def make_batch_pool():
+    if SANDBOX is not None:
+        return ThreadPoolExecutor(max_workers=SANDBOX.workers, thread_name_prefix="kanp-batch")
+    # Handler threads share the GIL, so batches get processes to use every core.
+    # Forking a threaded server is unsafe, workers come from a forkserver instead.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+
+def make_sandbox():
+    return SandboxPool(
+        run_recorded,
+        workers=int(os.environ.get("KANP_SANDBOX_WORKERS", 0)) or None,
+        max_jobs=int(os.environ.get("KANP_SANDBOX_MAX_JOBS", 100)),
+        cpu_seconds=int(os.environ.get("KANP_SANDBOX_CPU_SECONDS", 5)),
+        memory_bytes=int(os.environ.get("KANP_SANDBOX_MEMORY_MB", 256)) * 1024 * 1024,
+    )
+
+def main():
+    global SANDBOX, BATCH
+    if RUN_MODE == "sandbox":
+        SANDBOX = make_sandbox()
+        print(f"Sandbox: {SANDBOX.workers} worker processes, {SANDBOX.cpu_seconds}s CPU per job")
+    BATCH = make_batch_pool()
+    if STATIC is not None:
+        print(f"Static cache: {STATIC.preload()} files from {STATIC.root}")
+        STATIC.watch(STATIC_WATCH_INTERVAL)
+    print(f"Serving KanpScript Website at http://localhost:{PORT} ({WORKERS} workers)")
+    try:
+        with ThreadPoolHTTPServer(("", PORT), KanpHandler, WORKERS) as httpd:
+            httpd.serve_forever()
+    finally:
+        BATCH.shutdown(wait=False, cancel_futures=True)
+        if SANDBOX is not None:
+            SANDBOX.close()
 
-print(f"Serving KanpScript Website at http://localhost:{PORT}")
-with socketserver.TCPServer(("", PORT), KanpHandler) as httpd:
-    httpd.serve_forever()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import os
+import re
+import time
+import gzip
+import stat as stat_mode
+import hashlib
+import mimetypes
+import threading
+from email.utils import formatdate
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are stored
+    brotli = None
+
+# Content types worth compressing; images and fonts already are
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "application/manifest+json",
+                      "application/xml", "image/svg+xml"}
+
+# A content hash in the file name (style.3f9a2c1d.css) means the name changes
+# whenever the content does, so browsers may keep it for good
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[^.]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else may be stored but is revalidated with its ETag on every use
+REVALIDATE = "no-cache"
+
+class StaticFile:
+    """One file from the static root, held in memory with its compressed variants."""
+
+    __slots__ = ("path", "mtime_ns", "size", "content_type", "etag", "last_modified", "cache_control", "variants")
+
+    def __init__(self, path, body, stat):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.cache_control = IMMUTABLE if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE
+        # Content-Encoding -> body, best first; identity ("") is always there
+        self.variants = {}
+        if self.compressible:
+            if brotli is not None:
+                self.add_variant("br", brotli.compress(body, quality=11), len(body))
+            self.add_variant("gzip", gzip.compress(body, 9, mtime=0), len(body))
+        self.variants[""] = body
+
+    @property
+    def compressible(self):
+        return self.content_type.startswith("text/") or self.content_type in COMPRESSIBLE_TYPES
+
+    def add_variant(self, encoding, body, original_size):
+        if len(body) < original_size:
+            self.variants[encoding] = body
+
+    def changed(self, stat):
+        return stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size
+
+    def select(self, accept_encoding):
+        """(encoding, body, etag) for a request's Accept-Encoding header.
+
+        Each variant gets its own strong ETag, so caches never mix them up.
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, body in self.variants.items():
+            if encoding == "" or encoding in accepted:
+                etag = f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+                return encoding, body, etag
+
+    @staticmethod
+    def matches(if_none_match, etag):
+        """True when an If-None-Match header names etag, the tag of the variant being served.
+
+        Another variant's tag does not match: the client holds different bytes.
+        """
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            # Weak comparison, as RFC 9110 asks for If-None-Match
+            if tag.removeprefix("W/") == etag:
+                return True
+        return False
+
+def parse_accept_encoding(header):
+    """Encodings an Accept-Encoding header allows (q=0 means refused)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name)
+    return accepted
+
+class StaticCache:
+    """In-memory copy of the files under root, for KanpHandler.do_GET.
+
+    Files are read once, at preload() or on their first request, with their
+    ETag and gzip (and brotli, when installed) variants computed up front,
+    so serving one is a dict lookup. watch() starts a thread that stats the
+    cached files every interval seconds and reloads the ones whose mtime or
+    size changed, or drops deleted ones; edits show up within one interval.
+    Files above max_file_bytes are not cached. Safe to share between threads.
+    """
+
+    def __init__(self, root, max_file_bytes=4 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_file_bytes = max_file_bytes
+        self.files = {}   # absolute path -> StaticFile
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.reloads = 0
+        self.lock = threading.Lock()
+        self.watcher = None
+
+    def get(self, rel_path):
+        """StaticFile for rel_path, loading it on first use; None if not servable."""
+        # Normalized first, so 'a/../b' and 'b' share one entry and nothing escapes root
+        path = os.path.normpath(os.path.join(self.root, rel_path.lstrip("/")))
+        if not path.startswith(self.root + os.sep):
+            return None
+        entry = self.files.get(path)
+        with self.lock:
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        return self.load(path)
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if not stat_mode.S_ISREG(stat.st_mode) or stat.st_size > self.max_file_bytes:
+                    return None
+                body = f.read()
+        except OSError:
+            return None
+        entry = StaticFile(path, body, stat)
+        with self.lock:
+            self.files[path] = entry
+            self.loads += 1
+        return entry
+
+    def preload(self):
+        """Loads every file under root now, returns how many were cached."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                self.load(os.path.join(dirpath, name))
+        return len(self.files)
+
+    def refresh(self):
+        """Reloads changed files and forgets deleted ones."""
+        for path, entry in list(self.files.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is None or entry.changed(stat):
+                with self.lock:
+                    self.files.pop(path, None)
+                if stat is not None and self.load(path) is not None:
+                    with self.lock:
+                        self.reloads += 1
+
+    def watch(self, interval=1.0):
+        if self.watcher is not None or not interval:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.refresh()
+
+        self.watcher = threading.Thread(target=run, name="static-watch", daemon=True)
+        self.watcher.start()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "files": len(self.files),
+                "bytes": sum(len(body) for entry in self.files.values() for body in entry.variants.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "reloads": self.reloads,
+            }
@@ -0,0 +1,440 @@
+import os
+import hashlib
+import marshal
+import importlib.util
+from types import CodeType
+from lexer import FastLexer
+from parser import *
+from errors import BaklolError, BhaukaalError, ThakGayaError
+from interpreter import ReturnValue, Budget
+from memo import MemoTable, MISS, check_purity
+from rope import add
+from closure_compiler import op_name, ClosureInterpreter
+
+# Bump whenever the generated Python changes shape, so old cache entries are ignored
+TRANSPILER_VERSION = 6
+
+# Operator chains and argument lists longer than this are flattened into a
+# tuple of walrus steps on a temporary instead of nested calls/parentheses:
+# CPython will not compile more than 200 nested parentheses
+CHAIN_LIMIT = 32
+
+PY_OPS = {
+    'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/',
+    'EQ': '==', 'NEQ': '!=', 'GT': '>', 'LT': '<', 'GTE': '>=', 'LTE': '<=',
+}
+
+class PythonTranspiler:
+    """Lowers the KanpScript AST into Python source.
+
+    Variables stay in the interpreter's global_env dict (read as env['x']),
+    so the dynamic scoping of Interpreter.visit_FunctionCall is kept: calls go
+    through the _begin/_bind/_invoke helpers, which bind params into env one
+    argument at a time and restore them afterwards. jabtak/agar become native
+    while/if and every kaam/rangbaaj body becomes a real Python function.
+    """
+
+    def __init__(self, budgeted=False):
+        # Without a budget, loops skip the per-iteration step count entirely
+        self.budgeted = budgeted
+        self.lines = []
+        self.indent = 0
+        self.function_count = 0
+        self.temp_count = 0
+        self.in_function = False
+        self.bhaukaal_depth = 0
+
+    def transpile(self, tree):
+        # The program body lives in a function: names in it are cached
+        # LOAD_GLOBALs, module-level code would pay a LOAD_NAME dict chain each
+        self.emit("def _main():")
+        self.block(tree)
+        self.emit("_main()")
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def block(self, nodes):
+        self.indent += 1
+        start = len(self.lines)
+        self.statements(nodes)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def statements(self, node):
+        if isinstance(node, list):
+            for stmt in node:
+                self.statements(stmt)
+            return
+        method_name = 'stmt_' + type(node).__name__
+        method = getattr(self, method_name, self.generic_stmt)
+        method(node)
+
+    def generic_stmt(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    def expr(self, node):
+        method_name = 'expr_' + type(node).__name__
+        method = getattr(self, method_name, self.generic_expr)
+        return method(node)
+
+    def generic_expr(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    # --- Expressions ---
+    def expr_Num(self, node):
+        return repr(node.value)
+
+    def expr_String(self, node):
+        return repr(node.value)
+
+    def expr_Boolean(self, node):
+        return repr(node.value)
+
+    def new_temp(self):
+        self.temp_count += 1
+        return f"_t{self.temp_count}"
+
+    def binop(self, node, left, right):
+        if op_name(node) == 'PLUS':
+            # May join strings: rope.add keeps long ones as Ropes
+            return f"_add({left}, {right})"
+        # Always parenthesized, so comparisons never turn into Python chains
+        return f"({left} {PY_OPS[node.op.type]} {right})"
+
+    def expr_BinOp(self, node):
+        # The left-leaning spine: 'a + b + c' parses as ((a + b) + c)
+        spine = [node]
+        while isinstance(spine[-1].left, BinOp):
+            spine.append(spine[-1].left)
+        if len(spine) <= CHAIN_LIMIT:
+            return self.binop(node, self.expr(node.left), self.expr(node.right))
+        # Same evaluation order, one level deep: (_t := a, _t := _add(_t, b), ...)[-1]
+        temp = self.new_temp()
+        steps = [f"{temp} := {self.expr(spine[-1].left)}"]
+        for binop in reversed(spine):
+            steps.append(f"{temp} := {self.binop(binop, temp, self.expr(binop.right))}")
+        return f"({', '.join(steps)})[-1]"
+
+    def expr_Negate(self, node):
+        return f"(0 - {self.expr(node.expression)})"
+
+    def expr_VarAccess(self, node):
+        name = repr(node.var_name)
+        return f"(env[{name}] if {name} in env else _undeclared({name}, {node.line}))"
+
+    def expr_FunctionCall(self, node):
+        call = f"_begin({node.name!r}, {len(node.args)}, {node.line})"
+        if len(node.args) > CHAIN_LIMIT:
+            temp = self.new_temp()
+            binds = [f"_bind({temp}, {i}, {self.expr(arg)})" for i, arg in enumerate(node.args)]
+            return f"_invoke(({temp} := {call}, {', '.join(binds)})[0])"
+        for i, arg in enumerate(node.args):
+            # Nested so each argument is evaluated right before it is bound
+            call = f"_bind({call}, {i}, {self.expr(arg)})"
+        return f"_invoke({call})"
+
+    # --- Statements ---
+    def stmt_VarDecl(self, node):
+        self.emit(f"env[{node.var_name!r}] = {self.expr(node.expression)}")
+
+    def stmt_VarAssign(self, node):
+        name = repr(node.left.var_name)
+        self.emit(f"if {name} not in env: _unassigned({name}, {node.line})")
+        self.emit(f"env[{name}] = {self.expr(node.right)}")
+
+    def stmt_Print(self, node):
+        self.emit(f"_print({self.expr(node.expression)})")
+
+    def stmt_IfBlock(self, node):
+        self.emit(f"if {self.expr(node.condition)}:")
+        self.block(node.body)
+        if node.else_body:
+            self.emit("else:")
+            self.block(node.else_body)
+
+    def stmt_WhileBlock(self, node):
+        self.emit(f"while {self.expr(node.condition)}:")
+        if self.budgeted:
+            # Budget step, inlined: a helper call per iteration costs more than the loop body
+            self.emit("    _ticks[0] -= 1")
+            self.emit(f"    if _ticks[0] < 0: _ticks[0] = _budget.check({node.line})")
+        self.block(node.body)
+
+    def stmt_BhaukaalBlock(self, node):
+        self.emit("try:")
+        self.bhaukaal_depth += 1
+        self.block(node.body)
+        self.bhaukaal_depth -= 1
+        self.emit("except Exception as e:")
+        self.emit("    _bhaukaal(e)")
+
+    def stmt_Throw(self, node):
+        self.emit(f"raise BaklolError({node.message!r}, {node.line!r})")
+
+    def stmt_FunctionDecl(self, node):
+        self.function_count += 1
+        py_name = f"_kaam_{self.function_count}"
+        self.emit(f"def {py_name}():")
+        outer = (self.in_function, self.bhaukaal_depth)
+        self.in_function, self.bhaukaal_depth = True, 0
+        self.block(node.body)
+        self.in_function, self.bhaukaal_depth = outer
+        self.emit(f"_declare(_Function({node.name!r}, {list(node.params)!r}, {py_name}, {node.is_expert!r}, "
+                  f"{node.memoize!r}, {node.impurity!r}, {node.line!r}))")
+
+    def stmt_FunctionCall(self, node):
+        self.emit(self.expr_FunctionCall(node))
+
+    def stmt_Return(self, node):
+        value = self.expr(node.expression)
+        if self.in_function and not self.bhaukaal_depth:
+            self.emit(f"return {value}")
+        else:
+            # Top level, or inside bhaukaal which must see it as an exception
+            self.emit(f"raise ReturnValue({value})")
+
+class PyFunction:
+    def __init__(self, name, params, body, is_expert=False, memoize=False, impurity=None, line=0):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.is_expert = is_expert
+        self.memoize = memoize
+        self.impurity = impurity
+        self.line = line
+
+    def __repr__(self):
+        return f"PyFunction({self.name}, {self.params})"
+
+# --- Code object cache ---
+# In-memory cache for long-running processes (server.py), keyed by source hash
+CODE_CACHE = {}
+CODE_CACHE_SIZE = 256
+# On-disk cache for repeated kanp.py runs. Set KANP_CACHE_DIR to '' to disable it.
+CACHE_DIR = os.environ.get("KANP_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "kanpscript"))
+# Files kept there; each write prunes the least recently used beyond this (0: no limit)
+CACHE_MAX_FILES = int(os.environ.get("KANP_CACHE_MAX_FILES", 256))
+CACHE_MAGIC = importlib.util.MAGIC_NUMBER + TRANSPILER_VERSION.to_bytes(2, "little")
+
+def source_hash(source, budgeted=False):
+    return hashlib.sha256(f"{TRANSPILER_VERSION}:{int(budgeted)}:{source}".encode("utf-8")).hexdigest()
+
+def transpile_source(source, budgeted=False):
+    tokens = FastLexer(source).tokenize()
+    tree = Parser(tokens).parse()
+    return PythonTranspiler(budgeted).transpile(check_purity(tree))
+
+def _read_disk_cache(key):
+    if not CACHE_DIR:
+        return None
+    try:
+        path = os.path.join(CACHE_DIR, key + ".kpyc")
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return None
+        code = marshal.loads(data[len(CACHE_MAGIC):])
+        os.utime(path)  # Recently used, so _prune_disk_cache keeps it
+        return code
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+def _write_disk_cache(key, code):
+    if not CACHE_DIR:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, key + ".kpyc")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(CACHE_MAGIC + marshal.dumps(code))
+        os.replace(tmp_path, path)
+        _prune_disk_cache()
+    except OSError:
+        # Cache is best effort, a read-only home just means no caching
+        pass
+
+def _prune_disk_cache():
+    """Deletes the least recently used .kpyc files beyond CACHE_MAX_FILES.
+
+    Entries from older TRANSPILER_VERSIONs are never read again, so they
+    are the first to go.
+    """
+    if not CACHE_MAX_FILES:
+        return
+    files = []
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".kpyc"):
+                try:
+                    files.append((entry.stat().st_mtime_ns, entry.path))
+                except OSError:
+                    pass  # Pruned by another process meanwhile
+    if len(files) <= CACHE_MAX_FILES:
+        return
+    files.sort()
+    for _, path in files[:len(files) - CACHE_MAX_FILES]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def compile_source(source, budgeted=False):
+    """Returns the Python code object for a KanpScript program, cached by source hash."""
+    key = source_hash(source, budgeted)
+    code = CODE_CACHE.get(key)
+    if code is not None:
+        return code
+
+    code = _read_disk_cache(key)
+    if code is None:
+        code = compile(transpile_source(source, budgeted), "<kanpscript>", "exec")
+        _write_disk_cache(key, code)
+
+    if len(CODE_CACHE) >= CODE_CACHE_SIZE:
+        CODE_CACHE.pop(next(iter(CODE_CACHE)))
+    CODE_CACHE[key] = code
+    return code
+
+# What compile() raises for generated Python nested deeper than CPython allows
+COMPILE_LIMITS = (SyntaxError, RecursionError, MemoryError)
+
+# --- Backend ---
+class PythonInterpreter:
+    """Interpreter-compatible backend that runs KanpScript as compiled Python."""
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        self.global_env = {}
+        self.functions = {}
+        self.output = output
+        self.budget = Budget(max_steps, timeout)
+        self.memos = MemoTable()
+
+    def visit(self, tree):
+        return self.run_code(self.prepare(tree))
+
+    def prepare(self, tree):
+        tree = check_purity(tree)
+        try:
+            return compile(PythonTranspiler(self.budget.enabled).transpile(tree), "<kanpscript>", "exec")
+        except COMPILE_LIMITS:
+            # Too deep for CPython (20 nested loops/bhaukaal, ~100 indents):
+            # the tree itself is the prepared program, run by run_fallback
+            return tree
+
+    def run_prepared(self, code):
+        if not isinstance(code, CodeType):
+            return self.run_fallback(code)
+        return self.run_code(code)
+
+    def run_source(self, source):
+        # Skips lexing, parsing and codegen when the source was seen before
+        try:
+            code = compile_source(source, self.budget.enabled)
+        except COMPILE_LIMITS:
+            return self.run_fallback(check_purity(Parser(FastLexer(source).tokenize()).parse()))
+        return self.run_code(code)
+
+    def run_fallback(self, tree):
+        """Runs tree on the closure backend, which scopes variables the same (dynamic) way.
+
+        It gets this interpreter's variables, functions, output, budget and
+        memos, so a fallback run looks like any other run from outside.
+        """
+        fallback = ClosureInterpreter()
+        fallback.global_env = self.global_env
+        fallback.functions = self.functions
+        fallback.output = self.output
+        fallback.budget = self.budget
+        fallback.memos = self.memos
+        return fallback.run_prepared(tree)
+
+    def run_code(self, code):
+        exec(code, self.make_namespace())
+
+    def make_namespace(self):
+        env = self.global_env
+        functions = self.functions
+        output = self.output
+        memos = self.memos
+        budget = self.budget
+        # Budget steps left in this chunk; a list so generated code can update it in place
+        ticks = [budget.start()]
+
+        def _print(value):
+            print(value, file=output)
+
+        def _undeclared(name, line):
+            raise BaklolError(f"Variable '{name}' dhoond rahe ho? Pehle declare to karo!", line)
+
+        def _unassigned(name, line):
+            raise BaklolError(f"Variable '{name}' declare nahi kiya hai be.", line)
+
+        def _bhaukaal(e):
+            if isinstance(e, ThakGayaError):
+                # Running out of budget is not the program's error to wrap
+                raise e
+            raise BhaukaalError(f"Bhaukaal machane me galti ho gayi: {str(e)}", 0)
+
+        def _declare(func):
+            functions[func.name] = func
+            memos.declare(func.name, func.is_expert, func.memoize, func.impurity, func.line)
+
+        def _begin(name, argc, line):
+            ticks[0] -= 1
+            if ticks[0] < 0:
+                ticks[0] = budget.check(line)
+            func = functions.get(name)
+            if func is None:
+                raise BaklolError(f"Function '{name}' kaun banayega? Hum?", line)
+            if argc != len(func.params):
+                raise BaklolError(f"Function '{name}' maang raha hai {len(func.params)} arguments, tum diye {argc}.", line)
+            return (func, {})
+
+        def _bind(call, index, value):
+            func, old_values = call
+            param = func.params[index]
+            if param in env:
+                old_values[param] = env[param]
+            env[param] = value
+            return call
+
+        def _invoke(call):
+            func, old_values = call
+            try:
+                if func.memoize:
+                    memo = memos.get(func.name)
+                    key = memo.key([env[param] for param in func.params])
+                    value = memo.get(key)
+                    if value is MISS:
+                        value = func.body()
+                        memo.put(key, value)
+                    return value
+                return func.body()
+            finally:
+                for param in func.params:
+                    if param in old_values:
+                        env[param] = old_values[param]
+                    else:
+                        del env[param]
+
+        return {
+            "env": env,
+            "_undeclared": _undeclared,
+            "_unassigned": _unassigned,
+            "_bhaukaal": _bhaukaal,
+            "_declare": _declare,
+            "_begin": _begin,
+            "_bind": _bind,
+            "_invoke": _invoke,
+            "_print": _print,
+            "_add": add,
+            "_ticks": ticks,
+            "_budget": budget,
+            "_Function": PyFunction,
+            "BaklolError": BaklolError,
+            "ReturnValue": ReturnValue,
+        }
@@ -0,0 +1,218 @@
+from bytecode import compile_program, BINARY_OP_NAMES
+from closure_compiler import BINARY_OPS
+from errors import BaklolError, BhaukaalError, ThakGayaError
+from interpreter import ReturnValue, Budget
+from memo import MemoTable, MISS, check_purity
+
+# BINARY_OP argument -> operator function, same order as bytecode.BINARY_OP_NAMES
+BINARY_OP_FUNCS = [BINARY_OPS[name] for name in BINARY_OP_NAMES]
+
+# Marks a param that was not in global_env before the call, so returning deletes it
+MISSING = object()
+
+class VM:
+    """Stack VM for bytecode.Code objects.
+
+    Interpreter-compatible: visit(ast) compiles the tree and runs it. Loops
+    and ifs are plain jumps, kaam calls push a heap-allocated frame instead of
+    recursing on the Python stack, returns are plain frame pops (no
+    ReturnValue exception) and tail calls replace the current frame, so
+    recursion depth is bounded by memory, not sys.getrecursionlimit().
+
+    Scoping is the same dynamic scoping as Interpreter.visit_FunctionCall:
+    params are patched into global_env and restored when the call returns.
+    Each frame keeps that restore list as a dict of param -> old value (or
+    MISSING); a tail call merges the callee's dict under the caller's, which
+    leaves global_env exactly as returning through both frames would.
+    """
+
+    def __init__(self, output=None, max_steps=None, timeout=None):
+        self.global_env = {}
+        self.functions = {}
+        self.output = output
+        self.budget = Budget(max_steps, timeout)
+        self.ticks = self.budget.start()
+        self.memos = MemoTable()
+
+    def visit(self, tree):
+        return self.run(self.prepare(tree))
+
+    def prepare(self, tree):
+        return compile_program(check_purity(tree))
+
+    def run_prepared(self, code):
+        self.ticks = self.budget.start()
+        return self.run(code)
+
+    def restore_params(self, old_values):
+        env = self.global_env
+        for param, value in old_values.items():
+            if value is MISSING:
+                del env[param]
+            else:
+                env[param] = value
+
+    def run(self, code):
+        env = self.global_env
+        functions = self.functions
+        output = self.output
+        memos = self.memos
+        budget = self.budget
+        ticks = self.ticks   # budget steps left in this chunk, see interpreter.Budget
+        binary_ops = BINARY_OP_FUNCS
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        # Caller state saved on CALL: (ops, consts, names, pc, func, old_values, bhaukaal, memoized)
+        frames = []
+        # Calls whose arguments are still being bound: (func, old_values)
+        pending = []
+
+        ops, consts, names = code.code, code.consts, code.names
+        pc = 0
+        func = None          # Function currently running, None at top level
+        old_values = None    # param -> global it shadows (or MISSING), restored on return
+        bhaukaal = 0         # open bhaukaal blocks in the current frame
+        memoized = None      # (memo, key) pairs the current frame's result is stored under
+
+        try:
+            while True:
+                op = ops[pc]
+                arg = ops[pc + 1]
+                pc += 2
+
+                if op == 0:    # LOAD_NAME
+                    try:
+                        push(env[names[arg]])
+                    except KeyError:
+                        raise BaklolError(f"Variable '{names[arg]}' dhoond rahe ho? Pehle declare to karo!",
+                                          (func.code if func else code).lines.get(pc - 2, 0)) from None
+                elif op == 1:  # LOAD_CONST
+                    push(consts[arg])
+                elif op == 2:  # BINARY_OP
+                    right = pop()
+                    stack[-1] = binary_ops[arg](stack[-1], right)
+                elif op == 3:  # STORE_NAME
+                    env[names[arg]] = pop()
+                elif op == 4:  # CHECK_NAME
+                    if names[arg] not in env:
+                        raise BaklolError(f"Variable '{names[arg]}' declare nahi kiya hai be.",
+                                          (func.code if func else code).lines.get(pc - 2, 0))
+                elif op == 5:  # POP_JUMP_IF_FALSE
+                    if not pop():
+                        pc = arg
+                elif op == 21:  # LOOP
+                    if pop():
+                        ticks -= 1
+                        if ticks < 0:
+                            ticks = budget.check((func.code if func else code).lines.get(pc - 2, 0))
+                        pc = arg
+                elif op == 6:  # JUMP
+                    pc = arg
+                elif op == 7:  # BEGIN_CALL
+                    ticks -= 1
+                    if ticks < 0:
+                        ticks = budget.check((func.code if func else code).lines.get(pc - 2, 0))
+                    name, argc = consts[arg]
+                    callee = functions.get(name)
+                    if callee is None:
+                        raise BaklolError(f"Function '{name}' kaun banayega? Hum?", (func.code if func else code).lines.get(pc - 2, 0))
+                    if argc != len(callee.params):
+                        raise BaklolError(f"Function '{name}' maang raha hai {len(callee.params)} arguments, tum diye {argc}.",
+                                          (func.code if func else code).lines.get(pc - 2, 0))
+                    pending.append((callee, {}))
+                elif op == 8:  # BIND_ARG
+                    callee, shadowed = pending[-1]
+                    param = callee.params[arg]
+                    shadowed[param] = env[param] if param in env else MISSING
+                    env[param] = pop()
+                elif op == 9:  # CALL
+                    callee, shadowed = pending.pop()
+                    entries = None
+                    if callee.memoize:
+                        memo = memos.get(callee.name)
+                        key = memo.key([env[param] for param in callee.params])
+                        value = memo.get(key)
+                        if value is not MISS:
+                            self.restore_params(shadowed)
+                            push(value)
+                            continue
+                        entries = ((memo, key),)
+                    frames.append((ops, consts, names, pc, func, old_values, bhaukaal, memoized))
+                    func, old_values, memoized = callee, shadowed, entries
+                    ops, consts, names = func.code.code, func.code.consts, func.code.names
+                    pc = 0
+                    bhaukaal = 0
+                elif op == 10 or op == 11:  # RETURN, RETURN_NONE
+                    value = pop() if op == 10 else None
+                    if func is None or bhaukaal:
+                        # Outside a function, or caught by bhaukaal like the tree-walker does
+                        raise ReturnValue(value)
+                    if memoized is not None:
+                        for memo, key in memoized:
+                            memo.put(key, value)
+                    self.restore_params(old_values)
+                    ops, consts, names, pc, func, old_values, bhaukaal, memoized = frames.pop()
+                    push(value)
+                elif op == 20:  # NEGATE
+                    stack[-1] = 0 - stack[-1]
+                elif op == 12:  # POP_TOP
+                    pop()
+                elif op == 13:  # PRINT
+                    print(pop(), file=output)
+                elif op == 14:  # DEFINE_FUNC
+                    function = consts[arg]
+                    functions[function.name] = function
+                    memos.declare(function.name, function.is_expert, function.memoize, function.impurity, function.line)
+                elif op == 15:  # SETUP_BHAUKAAL
+                    bhaukaal += 1
+                elif op == 16:  # END_BHAUKAAL
+                    bhaukaal -= 1
+                elif op == 17:  # THROW
+                    message, line = consts[arg]
+                    raise BaklolError(message, line)
+                elif op == 18:  # HALT
+                    self.ticks = ticks
+                    return None
+                elif op == 19:  # TAIL_CALL
+                    callee, shadowed = pending.pop()
+                    if callee.memoize:
+                        memo = memos.get(callee.name)
+                        key = memo.key([env[param] for param in callee.params])
+                        value = memo.get(key)
+                        if value is not MISS:
+                            # Return the cached result from this frame, as the callee would have
+                            self.restore_params(shadowed)
+                            if memoized is not None:
+                                for memo, key in memoized:
+                                    memo.put(key, value)
+                            self.restore_params(old_values)
+                            ops, consts, names, pc, func, old_values, bhaukaal, memoized = frames.pop()
+                            push(value)
+                            continue
+                        # The callee's result is this frame's result too
+                        memoized = (memoized or ()) + ((memo, key),)
+                    # Caller's saved values win: they are what returning
+                    # through the caller would have restored last
+                    shadowed.update(old_values)
+                    func, old_values = callee, shadowed
+                    ops, consts, names = func.code.code, func.code.consts, func.code.names
+                    pc = 0
+                else:
+                    raise Exception(f"Unknown opcode {op}")
+        except Exception as e:
+            # Nothing in KanpScript recovers from an error: bhaukaal only
+            # rewraps it. Unwind frame by frame, wrapping once per open
+            # bhaukaal block and restoring params, then re-raise.
+            error = e
+            while True:
+                # Running out of budget is not the program's error to wrap
+                for _ in range(0 if isinstance(e, ThakGayaError) else bhaukaal):
+                    error = BhaukaalError(f"Bhaukaal machane me galti ho gayi: {str(error)}", 0)
+                if func is None:
+                    break
+                self.restore_params(old_values)
+                ops, consts, names, pc, func, old_values, bhaukaal, memoized = frames.pop()
+            if error is e:
+                raise
+            raise error